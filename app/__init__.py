@@ -2,36 +2,69 @@
 Initialization of app module
 """
 
+from app.database import RoutingSQLAlchemy
 from config import Config
-from flask import Flask
+from flask import Flask, g
 from flask_login import LoginManager
 from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging.handlers import RotatingFileHandler
+from jinja2 import FileSystemBytecodeCache
 import os
+import time
 
-# initialize Flask app with configs, database & logging
-app = Flask(__name__)
-app.config.from_object(Config)
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-login = LoginManager(app)
-login.login_view = 'login_page'
+# extensions are created without an application, they are bound to every application by create_app()
+db = RoutingSQLAlchemy()
+migrate = Migrate(render_as_batch=True)
+login = LoginManager()
+login.login_view = 'main.login_page'
 
-# create folder for logs, if it does not exist already
-if not os.path.exists('logs'):
-    os.mkdir('logs')
 
-# configuration for logging
-file_handler = RotatingFileHandler('logs/tima.log', maxBytes=10240, backupCount=10)
-file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
-file_handler.setLevel(logging.INFO)
-app.logger.addHandler(file_handler)
-app.logger.setLevel(logging.INFO)
+def private_folder(path):
+    """
+    This method creates the folder only accessible by the current user and checks that nobody else can write into it
+    (the compiled templates in it are executed by the application)
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    stat = os.stat(path)
+    if hasattr(os, 'getuid') and (stat.st_uid != os.getuid() or stat.st_mode & 0o022):
+        raise RuntimeError(f'The folder {path} has to be owned by the user of the application and not writable by others')
+    return path
 
-# first log on every startup of the application
-app.logger.info('TiMa startup')
 
+def create_app(config=Config):
+    """
+    This method creates a new Flask app with the given configs, the database, logging and all blueprints.
+    Modules are only imported here, so that importing the package stays cheap.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+    db.init_app(app)
+    migrate.init_app(app, db)
+    login.init_app(app)
 
-from app import routes, models, errors, api
+    # the start of every request is measured once (for the log & the metrics)
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    # templates are compiled only once (and not again by every worker process)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(private_folder(app.config['TEMPLATE_CACHE_FOLDER']))
+
+    # logging as JSON lines into the log file, which is written by a background thread
+    from app.log import configure_logging
+    configure_logging(app)
+
+    # after request handlers are called in reverse order, so responses are compressed at last
+    from app import api, commands, compression, errors, exports, health, metrics, models, profiling, routes
+    app.register_blueprint(compression.bp)
+    app.register_blueprint(metrics.bp)
+    app.register_blueprint(profiling.bp)
+    app.register_blueprint(errors.bp)
+    app.register_blueprint(health.bp)
+    app.register_blueprint(routes.bp)
+    app.register_blueprint(api.bp)
+    app.register_blueprint(exports.bp)
+    app.register_blueprint(commands.bp)
+
+    # first log on every startup of the application
+    app.logger.info('TiMa startup')
+    return app
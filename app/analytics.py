@@ -0,0 +1,118 @@
+"""
+Company wide analytics of working hours, calculated with vectorized operations
+"""
+
+from app import db
+from app.models import change_listeners, MonthlySummary, User
+from flask import current_app
+import numpy
+from sqlalchemy import func, select
+import time
+
+PERCENTILES = (10, 25, 50, 75, 90)
+# bounds (in hours of flextime) of the buckets of the overtime distribution
+DISTRIBUTION_BOUNDS = (-40, -20, -10, 0, 10, 20, 40)
+
+
+def analytics_cache():
+    """
+    This method responses with the calculated analytics per company with the time, until they are valid
+    (cached per application)
+    """
+    return current_app.extensions.setdefault('analytics_cache', {})
+
+
+def clear_analytics_cache(user_ids):
+    """
+    This method is called after working hours were changed. All cached analytics are discarded.
+    """
+    analytics_cache().clear()
+
+
+change_listeners.append(clear_analytics_cache)
+
+
+def load_company_columns(company):
+    """
+    This method loads the totals of all employees of the company with a single query.
+    The totals are summed up from the monthly summaries and returned column by column as arrays.
+    """
+    statement = select(User.id, User.username, User.target_time,
+                       func.coalesce(func.sum(MonthlySummary.worked_days), 0),
+                       func.coalesce(func.sum(MonthlySummary.worked_hours), 0)) \
+        .outerjoin(MonthlySummary, MonthlySummary.user_id == User.id) \
+        .where(User.company == company) \
+        .group_by(User.id, User.username, User.target_time) \
+        .order_by(User.id)
+    rows = db.session.execute(statement).all()
+    (ids, usernames, target_times, worked_days, worked_hours) = zip(*rows) if rows else ((),) * 5
+
+    return (numpy.array(ids, dtype=numpy.int64), list(usernames),
+            numpy.array(target_times, dtype=numpy.float64),
+            numpy.array(worked_days, dtype=numpy.int64),
+            numpy.array(worked_hours, dtype=numpy.float64))
+
+
+def calculate_company_analytics(company):
+    """
+    This method calculates the statistics of every employee and of the whole company.
+    All calculations are done on whole columns at once instead of looping over users.
+    """
+    (ids, usernames, target_times, worked_days, worked_hours) = load_company_columns(company)
+    target_hours = worked_days * numpy.nan_to_num(target_times)
+    flextime = worked_hours - target_hours
+
+    employees = [{
+        'id': int(ids[index]),
+        'username': usernames[index],
+        'worked_days': int(worked_days[index]),
+        'worked_hours': round(float(worked_hours[index]), 2),
+        'target_hours': round(float(target_hours[index]), 2),
+        'flextime': round(float(flextime[index]), 2)
+    } for index in numpy.argsort(-flextime, kind='stable')]
+
+    # the distribution counts, how many employees have a flextime within the bounds of each bucket
+    bounds = numpy.array(DISTRIBUTION_BOUNDS, dtype=numpy.float64)
+    counts = numpy.bincount(numpy.searchsorted(bounds, flextime, side='right'), minlength=len(bounds) + 1)
+    lower_bounds = (None,) + DISTRIBUTION_BOUNDS
+    upper_bounds = DISTRIBUTION_BOUNDS + (None,)
+    distribution = [{'from': lower, 'to': upper, 'employees': int(count)}
+                    for (lower, upper, count) in zip(lower_bounds, upper_bounds, counts)]
+
+    flextime_statistics = None
+    if len(flextime) > 0:
+        flextime_statistics = {
+            'total': round(float(flextime.sum()), 2),
+            'mean': round(float(flextime.mean()), 2),
+            'min': round(float(flextime.min()), 2),
+            'max': round(float(flextime.max()), 2),
+            'percentiles': {str(percentile): round(float(value), 2) for (percentile, value)
+                            in zip(PERCENTILES, numpy.percentile(flextime, PERCENTILES))},
+            'employees_with_overtime': int(numpy.count_nonzero(flextime > 0))
+        }
+
+    return {
+        'company': company,
+        'employees': len(ids),
+        'worked_days': int(worked_days.sum()),
+        'worked_hours': round(float(worked_hours.sum()), 2),
+        'target_hours': round(float(target_hours.sum()), 2),
+        'flextime': flextime_statistics,
+        'overtime_distribution': distribution,
+        'employee_statistics': employees
+    }
+
+
+def get_company_analytics(company):
+    """
+    This method responses with the analytics of the company.
+    The result is cached until working hours are changed or the cache timeout is reached.
+    """
+    now = time.monotonic()
+    cached = analytics_cache().get(company)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    analytics = calculate_company_analytics(company)
+    analytics_cache()[company] = (now + current_app.config['ANALYTICS_CACHE_TIMEOUT'], analytics)
+    return analytics
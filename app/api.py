@@ -2,12 +2,23 @@
 All served Web API's are listed in this file
 """
 
-from app import app, db
-from app.models import User, WorkingHours
+from app import db
+from app.exports import EXPORT_FORMATS, export_rows, generate_export
+from app.models import ArchivedYear, mark_changed, MonthlySummary, User, WorkingHours, WorkingHoursTombstone
+from app.reports import REPORT_GROUPS, create_report
+from app.serialization import WORKING_HOURS_FIELDS, parse_fields, serialize_rows
 import datetime
-from flask import jsonify, request
+from functools import wraps
+import hashlib
+import heapq
+import itertools
+import json
+from flask import Blueprint, current_app, jsonify, make_response, request, Response, stream_with_context, url_for
 from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth
+from sqlalchemy import and_, asc, bindparam, insert, or_, update
+from sqlalchemy.exc import DataError, IntegrityError
 
+bp = Blueprint('api', __name__)
 basic_auth = HTTPBasicAuth()
 token_auth = HTTPTokenAuth()
 
@@ -49,7 +60,48 @@ def token_auth_error(status):
     return jsonify({'error': 'Invalid authorization token.'}), status
 
 
-@app.route('/api/tokens', methods=['POST'])
+def read_from_replica(function):
+    """
+    This decorator allows the view to read from the replica (see use_replica).
+    It is placed before conditional, so that the data version of the ETag is read from the same database as the data.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        db.use_replica(token_auth.current_user())
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def conditional(function):
+    """
+    This decorator adds an ETag & Last-Modified header to responses of the WebAPI.
+    The ETag is derived from the data version of the user and the requested URL. If the client already has
+    the current version (If-None-Match), it gets an empty 304 response without loading any data.
+    The version is read in the same session (and from the same database) as the data, so a lagging replica never sends
+    old data with the ETag of new data. If-Modified-Since is not evaluated: Last-Modified has a resolution of seconds,
+    so a change within the same second as the previous response would be answered with 304.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        user_id = token_auth.current_user().id
+        (data_version, data_modified) = db.session.query(User.data_version, User.data_modified) \
+            .filter(User.id == user_id).one()
+        etag = hashlib.sha1(f'{user_id}:{data_version}:{request.full_path}'.encode('utf-8')).hexdigest()
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(function(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.last_modified = data_modified.replace(tzinfo=datetime.timezone.utc) if data_modified else None
+        return response
+    return wrapper
+
+
+@bp.route('/api/tokens', methods=['POST'])
 @basic_auth.login_required
 def get_token():
     """
@@ -64,7 +116,7 @@ def get_token():
         return jsonify({'error': 'Invalid authorization!'}), 401
 
 
-@app.route('/api/tokens', methods=['DELETE'])
+@bp.route('/api/tokens', methods=['DELETE'])
 @token_auth.login_required
 def revoke_token():
     """
@@ -79,17 +131,20 @@ def revoke_token():
         return jsonify({'error': 'Invalid authorization!'}), 401
 
 
-@app.route('/api/users', methods=['GET'])
+@bp.route('/api/users', methods=['GET'])
 @token_auth.login_required
+@read_from_replica
+@conditional
 def get_user():
     """
     This method responses with fetched user data accordingly to given authorization token
     """
-    data = User.query.get_or_404(token_auth.current_user().id).to_dict()
+    # the authorized user may have been loaded from the primary database, so it is loaded again (e.g. from the replica)
+    data = User.query.populate_existing().get_or_404(token_auth.current_user().id).to_dict()
     return jsonify(data)
 
 
-@app.route('/api/users', methods=['POST'])
+@bp.route('/api/users', methods=['POST'])
 def create_new_user():
     """
     This method takes all necessary data to create a new user. With those data, a new user is created and stored
@@ -123,11 +178,11 @@ def create_new_user():
 
         return jsonify(user.to_dict()), 201
     except Exception as error:
-        app.logger.error(error)
+        current_app.logger.error(error)
         return '', 400
 
 
-@app.route('/api/users', methods=['PUT'])
+@bp.route('/api/users', methods=['PUT'])
 @token_auth.login_required
 def update_user():
     """
@@ -163,18 +218,216 @@ def update_user():
     return jsonify(user.to_dict())
 
 
-@app.route('/api/working-hours', methods=['GET'])
+def parse_date_argument(name):
+    """
+    This method reads an optional date query parameter in format YYYY-MM-DD.
+    A ValueError is raised, if the given value is not a valid date.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def parse_cursor_argument():
+    """
+    This method reads the optional query parameter 'after' of the form <YYYY-MM-DD>,<id>.
+    It is the position of the last record of the previous page.
+    """
+    value = request.args.get('after')
+    if value is None:
+        return None
+    date, id = value.split(',')
+    return datetime.datetime.strptime(date, '%Y-%m-%d').date(), int(id)
+
+
+def merge_archived_rows(rows, fields, user_id, date_from, date_to, after, count):
+    """
+    This method merges the records of archived years (which are not in the database anymore) into the rows of the
+    database. The rows are sorted by date & id and only the first count rows are returned.
+    """
+    if after is not None and (date_from is None or after[0] > date_from):
+        date_from = after[0]
+    years = ArchivedYear.years(date_from, date_to)
+    if not years:
+        return rows
+
+    # numpy is only loaded, when archived records are read the first time
+    from app.archive import read_archive
+    archived = [[tuple(getattr(row, field) for field in fields) + (row.date, row.id)
+                 for row in read_archive(year).rows(user_id, date_from, date_to)
+                 if after is None or (row.date, row.id) > after] for year in years]
+    return list(itertools.islice(heapq.merge(*archived, rows, key=lambda row: row[-2:]), count))
+
+
+def merge_archived_changes(rows, fields, user_id, since, cursor):
+    """
+    This method merges the records of archived years, which were changed after the version since, into the changes of
+    the database. The records keep their change versions in the archive, so the rows stay sorted by version & id.
+    """
+    years = ArchivedYear.years()
+    if not years:
+        return rows
+
+    # numpy is only loaded, when archived records are read the first time
+    from app.archive import read_archive
+    archived = [sorted((tuple(getattr(row, field) for field in fields) + (version, row.id)
+                        for (version, row) in read_archive(year).changed_rows(user_id, since, cursor)),
+                       key=lambda row: row[-2:]) for year in years]
+    return list(heapq.merge(*archived, rows, key=lambda row: row[-2:]))
+
+
+@bp.route('/api/working-hours', methods=['GET'])
 @token_auth.login_required
+@read_from_replica
+@conditional
 def get_working_hours():
     """
-    This method responses with all tracked working hours of the user
+    This method responses with tracked working hours of the user sorted by date.
+    The records are paginated by a cursor (query parameter 'after') and can be restricted by 'from' and 'to'.
+    With the query parameter 'fields' (e.g. 'date,working_hours'), only the given fields are sent.
+    If there are more records, a link to the next page is provided in the 'Link' header.
+    Records of archived years are included (they can be read, but not changed).
+    """
+    try:
+        date_from = parse_date_argument('from')
+        date_to = parse_date_argument('to')
+        after = parse_cursor_argument()
+        limit = int(request.args.get('limit', current_app.config['API_PAGE_SIZE']))
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError:
+        return jsonify({'error': 'Invalid query parameters.'}), 400
+
+    # the limit must be in a reasonable range, so that a single response stays small
+    limit = min(max(limit, 1), current_app.config['API_MAX_PAGE_SIZE'])
+
+    # only the requested columns (and date & id for the cursor) are selected as tuples without building ORM objects.
+    # all filters are answered by the index on (user_id, date)
+    user_id = token_auth.current_user().id
+    columns = [getattr(WorkingHours, field) for field in fields] + [WorkingHours.date, WorkingHours.id]
+    query = db.session.query(*columns).filter(WorkingHours.user_id == user_id)
+    if date_from is not None:
+        query = query.filter(WorkingHours.date >= date_from)
+    if date_to is not None:
+        query = query.filter(WorkingHours.date <= date_to)
+    if after is not None:
+        query = query.filter(or_(WorkingHours.date > after[0],
+                                 and_(WorkingHours.date == after[0], WorkingHours.id > after[1])))
+
+    # one more record than requested is loaded to know if there is a next page
+    rows = query.order_by(asc(WorkingHours.date), asc(WorkingHours.id)).limit(limit + 1).all()
+    rows = merge_archived_rows(rows, fields, user_id, date_from, date_to, after, limit + 1)
+    response = current_app.response_class(serialize_rows(rows[:limit], fields), mimetype='application/json')
+
+    if len(rows) > limit:
+        (date, id) = rows[limit - 1][-2:]
+        args = request.args.to_dict()
+        args.update({'after': f'{date.isoformat()},{id}', 'limit': limit})
+        response.headers['Link'] = f'<{url_for("api.get_working_hours", _external=True, **args)}>; rel="next"'
+    return response
+
+
+@bp.route('/api/working-hours/changes', methods=['GET'])
+@token_auth.login_required
+@conditional
+def get_working_hours_changes():
+    """
+    This method responses with the records of working hours, which were created or changed after the given cursor
+    (query parameter 'since'), and the ids of the deleted records. The response contains the cursor for the next sync.
+    Without a cursor (or with 0), all records are sent. Deleted ids have to be applied first, as they may be reused.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid query parameters.'}), 400
+
+    # the cursor is the data version of the user. Only changes up to the version read first are sent, so that
+    # concurrent changes are not missed, but sent with the next sync. The replica is not used, as it may lag behind
+    # a cursor already sent to the client.
+    user_id = token_auth.current_user().id
+    cursor = db.session.query(User.data_version).filter(User.id == user_id).scalar()
+    if since < 0 or since > cursor:
+        return jsonify({'error': 'Invalid query parameters.'}), 400
+
+    fields = WORKING_HOURS_FIELDS
+    rows = db.session.query(*[getattr(WorkingHours, field) for field in fields],
+                            WorkingHours.change_version, WorkingHours.id) \
+        .filter(WorkingHours.user_id == user_id, WorkingHours.change_version > since,
+                WorkingHours.change_version <= cursor) \
+        .order_by(asc(WorkingHours.change_version), asc(WorkingHours.id)).all()
+    rows = merge_archived_changes(rows, fields, user_id, since, cursor)
+    deleted = [id for (id,) in db.session.query(WorkingHoursTombstone.working_hours_id).filter(
+        WorkingHoursTombstone.user_id == user_id, WorkingHoursTombstone.change_version > since,
+        WorkingHoursTombstone.change_version <= cursor).order_by(asc(WorkingHoursTombstone.id))]
+    body = f'{{"changes":{serialize_rows(rows, fields)},"cursor":{cursor},"deleted":{json.dumps(deleted)}}}'
+    return current_app.response_class(body, mimetype='application/json')
+
+
+@bp.route('/api/working-hours/export', methods=['GET'])
+@token_auth.login_required
+def export_working_hours():
     """
-    data = WorkingHours.query.filter_by(user_id=token_auth.current_user().id).all()
-    return jsonify(list(map(lambda x: x.to_dict(), data)))
+    This method streams all tracked working hours of the user as CSV or NDJSON (query parameter 'format').
+    The records can be restricted by the query parameters 'from' and 'to'. Records of archived years are included.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Format must be csv or ndjson.'}), 400
+    try:
+        date_from = parse_date_argument('from')
+        date_to = parse_date_argument('to')
+    except ValueError:
+        return jsonify({'error': 'Invalid query parameters.'}), 400
 
+    db.use_replica(token_auth.current_user())
+    query = export_rows(token_auth.current_user().id, date_from, date_to)
+    response = Response(stream_with_context(generate_export(query, export_format)),
+                        mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=working-hours.{export_format}'
+    return response
 
-@app.route('/api/working-hours/<int:id>', methods=['GET'])
+
+@bp.route('/api/reports', methods=['GET'])
 @token_auth.login_required
+@read_from_replica
+@conditional
+def get_report():
+    """
+    This method responses with the sums of working hours, worked days, target hours & flextime of the user
+    per day, week, month or year (query parameter 'group'). The records can be restricted by 'from' and 'to'.
+    """
+    group = request.args.get('group', 'month')
+    if group not in REPORT_GROUPS:
+        return jsonify({'error': 'Group must be day, week, month or year.'}), 400
+    try:
+        date_from = parse_date_argument('from')
+        date_to = parse_date_argument('to')
+    except ValueError:
+        return jsonify({'error': 'Invalid query parameters.'}), 400
+
+    periods = create_report(token_auth.current_user(), group, date_from, date_to)
+    return jsonify({'group': group, 'periods': periods})
+
+
+@bp.route('/api/company/analytics', methods=['GET'])
+@token_auth.login_required
+def get_company_report():
+    """
+    This method responses with the flextime statistics of all employees of the company of the user.
+    Only administrators (see config ADMINS) are allowed to see the data of other employees.
+    """
+    user = token_auth.current_user()
+    if user.username not in current_app.config['ADMINS']:
+        return jsonify({'error': 'Only administrators are allowed to see company analytics.'}), 403
+
+    # numpy is only loaded, when analytics are requested the first time
+    from app.analytics import get_company_analytics
+    return jsonify(get_company_analytics(user.company))
+
+
+@bp.route('/api/working-hours/<int:id>', methods=['GET'])
+@token_auth.login_required
+@conditional
 def get_working_hours_by_id(id):
     """
     This method responses with a specific tracked working hours identified by the id of the user
@@ -187,7 +440,7 @@ def get_working_hours_by_id(id):
     return jsonify(data.to_dict())
 
 
-@app.route('/api/working-hours', methods=['POST'])
+@bp.route('/api/working-hours', methods=['POST'])
 @token_auth.login_required
 def add_working_hours():
     """
@@ -204,27 +457,131 @@ def add_working_hours():
         if 'comment' in hours.keys():
             comment = hours['comment']
 
-        # check if there is already a record of given user for given date.
-        existing_hours = WorkingHours.query.filter_by(user_id=token_auth.current_user().id, date=date).first()
-        if existing_hours is not None:
-            return jsonify({'error': 'There is already an entry for given date.'}), 400
-
         # check if provided working hours mets the requirements
         if float(working_hours) < 0 or float(working_hours) > 24:
             return jsonify({'error': 'Working hours must be between 0 and 24'}), 400
-
-        # create record and save it to database
-        working_hours = WorkingHours(date=date, working_hours=working_hours, comment=comment,
-                                     user_id=token_auth.current_user().id)
-        db.session.add(working_hours)
+        if ArchivedYear.contains(date):
+            return jsonify({'error': 'The year of given date is archived and can not be changed anymore.'}), 400
+
+        # create record and save it to database. If there is already a record of given user for given date,
+        # the unique index prevents the insert.
+        working_hours = WorkingHours.create(date=date.date(), working_hours=float(working_hours), comment=comment,
+                                            user_id=token_auth.current_user().id)
+        if working_hours is None:
+            return jsonify({'error': 'There is already an entry for given date.'}), 400
+        MonthlySummary.record(working_hours.user_id, working_hours.date, days=1, hours=working_hours.working_hours)
         db.session.commit()
         return jsonify(working_hours.to_dict()), 201
     except Exception as error:
-        app.logger.error(error)
+        current_app.logger.error(error)
         return '', 400
 
 
-@app.route('/api/working-hours/<int:id>', methods=['PUT'])
+@bp.route('/api/working-hours/batch', methods=['POST'])
+@token_auth.login_required
+def add_working_hours_batch():
+    """
+    This method allows the user to create or update many records of working hours at once.
+    The body must be a list of records like for a single record. If there is already a record for a date,
+    it will be updated. All changes are stored in one transaction and the result of every record is responded.
+    """
+    entries = request.get_json(silent=True)
+    if not isinstance(entries, list):
+        return jsonify({'error': 'A list of working hours is required.'}), 400
+    if len(entries) > current_app.config['API_MAX_BATCH_SIZE']:
+        return jsonify({'error': f'At most {current_app.config["API_MAX_BATCH_SIZE"]} entries are allowed.'}), 400
+
+    user_id = token_auth.current_user().id
+    archived_years = set(year for (year,) in db.session.query(ArchivedYear.year))
+    results = [None] * len(entries)
+    valid_entries = {}
+    for index, hours in enumerate(entries):
+        # every entry is validated on its own, invalid entries are skipped
+        try:
+            date = datetime.datetime.strptime(hours['date'], '%Y-%m-%d').date()
+            working_hours = float(hours['working_hours'])
+            comment = hours.get('comment') or ''
+        except Exception:
+            results[index] = {'status': 400, 'error': 'Date (YYYY-MM-DD) and working_hours are required.'}
+            continue
+        if not 0 <= working_hours <= 24:
+            results[index] = {'status': 400, 'error': 'Working hours must be between 0 and 24'}
+            continue
+        if not isinstance(comment, str) or len(comment) > WorkingHours.comment.type.length:
+            results[index] = {'status': 400, 'error': f'Comment must be a text of at most '
+                                                      f'{WorkingHours.comment.type.length} characters.'}
+            continue
+        if date.year in archived_years:
+            results[index] = {'status': 400, 'error': 'The year of the date is archived.'}
+            continue
+        if date in valid_entries:
+            results[index] = {'status': 400, 'error': 'The date is given more than once.'}
+            continue
+        valid_entries[date] = (index, working_hours, comment)
+    if not valid_entries:
+        return jsonify(results)
+
+    # existing records for all given dates are loaded with a single query (as tuples, no ORM objects).
+    # They are locked, as the monthly summaries are changed by the differences to their current hours
+    existing_hours = {date: (id, working_hours) for (id, date, working_hours) in db.session.query(
+        WorkingHours.id, WorkingHours.date, WorkingHours.working_hours).filter(
+        WorkingHours.user_id == user_id, WorkingHours.date.in_(valid_entries.keys())).with_for_update()}
+
+    # existing records are updated, all others are created. The changes are summed up per month.
+    (new_rows, updated_rows) = ([], [])
+    monthly_changes = {}
+    for date, (index, working_hours, comment) in valid_entries.items():
+        (days, hours) = monthly_changes.get((date.year, date.month), (0, 0.0))
+        if date in existing_hours:
+            (id, previous_hours) = existing_hours[date]
+            updated_rows.append({'hours_id': id, 'new_hours': working_hours, 'new_comment': comment})
+            monthly_changes[(date.year, date.month)] = (days, hours + working_hours - previous_hours)
+        else:
+            new_rows.append({'date': date, 'working_hours': working_hours, 'comment': comment, 'user_id': user_id})
+            monthly_changes[(date.year, date.month)] = (days + 1, hours + working_hours)
+
+    # the data version is increased once, all records get the new version as change version (see the change feed).
+    # New records are inserted with a single statement and updates are sent at once (executemany).
+    # If a record for one of the dates was created concurrently, the unique index prevents a duplicate. If an existing
+    # record was deleted concurrently, fewer records are updated. In both cases, nothing is stored.
+    table = WorkingHours.__table__
+    try:
+        mark_changed(user_id)
+        version = db.session.query(User.data_version).filter(User.id == user_id).scalar()
+        if new_rows:
+            db.session.execute(insert(table).values([dict(row, change_version=version) for row in new_rows]))
+        updated = 0
+        if updated_rows:
+            updated = db.session.execute(update(table).where(table.c.id == bindparam('hours_id')).values(
+                working_hours=bindparam('new_hours'), comment=bindparam('new_comment'), change_version=version),
+                updated_rows).rowcount
+    except IntegrityError:
+        updated = None
+    except DataError:
+        db.session.rollback()
+        return jsonify({'error': 'The working hours contain invalid values.'}), 400
+    if updated != len(updated_rows):
+        db.session.rollback()
+        return jsonify({'error': 'The working hours were changed concurrently. Please try again.'}), 409
+    for ((year, month), (days, hours)) in monthly_changes.items():
+        MonthlySummary.record(user_id, datetime.date(year, month, 1), days=days, hours=hours)
+
+    # the ids of the created records are loaded with a single query, so that the results contain all values
+    created_ids = {}
+    if new_rows:
+        created_ids = {date: id for (id, date) in db.session.query(WorkingHours.id, WorkingHours.date).filter(
+            WorkingHours.user_id == user_id, WorkingHours.date.in_([row['date'] for row in new_rows]))}
+    for date, (index, working_hours, comment) in valid_entries.items():
+        (status, id) = (200, existing_hours[date][0]) if date in existing_hours else (201, created_ids[date])
+        results[index] = {'status': status, 'data': WorkingHours(
+            id=id, date=date, working_hours=working_hours, comment=comment, user_id=user_id).to_dict()}
+
+    # save all changes at once to the database
+    db.session.commit()
+    return jsonify(results)
+
+
+@bp.route('/api/working-hours/<int:id>', methods=['PUT'])
 @token_auth.login_required
 def update_working_hours(id):
     """
@@ -237,14 +594,16 @@ def update_working_hours(id):
     except:
         hours_data = {}
 
-    # check if there is already a record to be updated
-    hours_entry = WorkingHours.query.filter_by(user_id=token_auth.current_user().id, id=id).first()
+    # check if there is already a record to be updated (it is locked, as the monthly summary is changed by the difference)
+    hours_entry = WorkingHours.lock(id, token_auth.current_user().id)
     if hours_entry is None:
         return jsonify({'error': 'There is no entry for given id.'}), 404
 
     # if working hours are updated, it has to satisfy the requirements
     if 'working_hours' in hours_data.keys():
         if 0 <= hours_data['working_hours'] <= 24:
+            MonthlySummary.record(hours_entry.user_id, hours_entry.date,
+                                  hours=hours_data['working_hours'] - hours_entry.working_hours)
             setattr(hours_entry, 'working_hours', hours_data['working_hours'])
 
     # if comment is provided, update the comment
@@ -256,18 +615,19 @@ def update_working_hours(id):
     return jsonify(hours_entry.to_dict())
 
 
-@app.route('/api/working-hours/<int:id>', methods=['DELETE'])
+@bp.route('/api/working-hours/<int:id>', methods=['DELETE'])
 @token_auth.login_required
 def delete_working_hours(id):
     """
     This method allows to delete an existing record of working hours from the user
     """
-    # check if there is a record of this user, which can be deleted
-    hours_entry = WorkingHours.query.filter_by(user_id=token_auth.current_user().id, id=id).first()
+    # check if there is a record of this user, which can be deleted (it is locked until the summary is changed)
+    hours_entry = WorkingHours.lock(id, token_auth.current_user().id)
     if hours_entry is None:
         return jsonify({'error': 'There is no entry for given id.'}), 404
 
     # delete the record from database
+    MonthlySummary.record(hours_entry.user_id, hours_entry.date, days=-1, hours=-hours_entry.working_hours)
     db.session.delete(hours_entry)
     db.session.commit()
     return '', 204
@@ -0,0 +1,199 @@
+"""
+Archive of closed years: the records of working hours of a year are moved from the database to column files.
+Every column is stored as .npy file with the smallest fitting type (e.g. the day of the year as uint16), so it can be
+read memory-mapped. The comments are compressed with zlib per user. Only the monthly summaries stay in the database.
+"""
+
+from app import db
+from app.models import ArchivedYear, mark_changed, WorkingHours
+from collections import namedtuple
+import datetime
+from flask import current_app
+import numpy
+import os
+import shutil
+from sqlalchemy import asc
+import zlib
+
+# a record of an archived year (with the same attributes as WorkingHours & the columns of exports)
+ArchivedHours = namedtuple('ArchivedHours', ['id', 'user_id', 'date', 'working_hours', 'comment'])
+
+# files of an archived year: users & offsets of their rows and comments, the columns and the compressed comments.
+# The change versions of the change feed were added later, older archives are read as changes of the first version.
+COLUMN_FILES = ('users', 'user_offsets', 'comment_offsets', 'id', 'day', 'working_hours', 'comment_length')
+CHANGE_VERSION_FILE = 'change_version.npy'
+COMMENTS_FILE = 'comments.zlib'
+
+
+def year_folder(year):
+    return os.path.join(current_app.config['ARCHIVE_FOLDER'], str(year))
+
+
+class YearArchive(object):
+    """
+    This class reads the records of an archived year from its memory-mapped column files.
+    The rows of a user are found by binary search, so only the pages of the requested rows are read from disk.
+    """
+
+    def __init__(self, year):
+        folder = year_folder(year)
+        self.first_day = datetime.date(year, 1, 1).toordinal()
+        self.columns = {name: numpy.load(os.path.join(folder, f'{name}.npy'), mmap_mode='r') for name in COLUMN_FILES}
+        self.comments = numpy.memmap(os.path.join(folder, COMMENTS_FILE), dtype=numpy.uint8, mode='r')
+        if os.path.exists(os.path.join(folder, CHANGE_VERSION_FILE)):
+            self.change_versions = numpy.load(os.path.join(folder, CHANGE_VERSION_FILE), mmap_mode='r')
+        else:
+            self.change_versions = numpy.ones(len(self.columns['id']), dtype=numpy.int64)
+
+    def user_rows(self, index, date_from=None, date_to=None):
+        """
+        This method responses with the records of the user at the given index, restricted by the dates (inclusive)
+        """
+        (start, end) = self.columns['user_offsets'][index:index + 2]
+        days = self.columns['day'][start:end]
+        first = 0 if date_from is None else numpy.searchsorted(days, date_from.toordinal() - self.first_day)
+        last = len(days) if date_to is None else numpy.searchsorted(days, date_to.toordinal() - self.first_day,
+                                                                    side='right')
+        if first >= last:
+            return []
+
+        # the comments of the user are decompressed at once and split by their lengths
+        (comment_start, comment_end) = self.columns['comment_offsets'][index:index + 2]
+        comments = zlib.decompress(self.comments[comment_start:comment_end].tobytes())
+        comment_bounds = numpy.zeros(end - start + 1, dtype=numpy.int64)
+        numpy.cumsum(self.columns['comment_length'][start:end], out=comment_bounds[1:])
+
+        user_id = int(self.columns['users'][index])
+        ids = self.columns['id'][start + first:start + last].tolist()
+        hours = self.columns['working_hours'][start + first:start + last].tolist()
+        bounds = comment_bounds.tolist()
+        return [ArchivedHours(id, user_id, datetime.date.fromordinal(self.first_day + day), working_hours,
+                              comments[bounds[row]:bounds[row + 1]].decode('utf-8'))
+                for (row, id, day, working_hours) in zip(range(first, last), ids, days[first:last].tolist(), hours)]
+
+    def rows(self, user_id=None, date_from=None, date_to=None):
+        """
+        This generator yields the records of all users (or a single user) sorted by user & date
+        """
+        users = self.columns['users']
+        if user_id is None:
+            indexes = range(len(users))
+        else:
+            index = int(numpy.searchsorted(users, user_id))
+            indexes = [index] if index < len(users) and users[index] == user_id else []
+        for index in indexes:
+            yield from self.user_rows(index, date_from, date_to)
+
+
+    def changed_rows(self, user_id, since, until):
+        """
+        This method responses with the records of the user, which were changed after the version since (up to the
+        version until), as (change version, record) sorted by date
+        """
+        users = self.columns['users']
+        index = int(numpy.searchsorted(users, user_id))
+        if index >= len(users) or users[index] != user_id:
+            return []
+        (start, end) = self.columns['user_offsets'][index:index + 2]
+        versions = self.change_versions[start:end]
+        changed = ((versions > since) & (versions <= until)).tolist()
+        if not any(changed):
+            return []
+        return [(version, row) for (version, row, selected) in zip(versions.tolist(), self.user_rows(index), changed)
+                if selected]
+
+
+def read_archive(year):
+    """
+    This method responses with the reader of the archived year. Archives never change, so the readers
+    (and their memory maps) are kept per application.
+    """
+    archives = current_app.extensions.setdefault('archives', {})
+    if year not in archives:
+        archives[year] = YearArchive(year)
+    return archives[year]
+
+
+def write_archive(year, folder):
+    """
+    This method writes all records of the year to column files in the given folder.
+    The rows are sorted by user & date and are loaded as tuples in batches.
+    It responses with the number of records.
+    """
+    query = db.session.query(WorkingHours.user_id, WorkingHours.id, WorkingHours.date, WorkingHours.working_hours,
+                             WorkingHours.comment, WorkingHours.change_version) \
+        .filter(WorkingHours.date >= datetime.date(year, 1, 1), WorkingHours.date <= datetime.date(year, 12, 31)) \
+        .order_by(asc(WorkingHours.user_id), asc(WorkingHours.date)) \
+        .yield_per(current_app.config['EXPORT_BATCH_SIZE'])
+
+    first_day = datetime.date(year, 1, 1).toordinal()
+    (users, user_offsets, comment_offsets) = ([], [], [])
+    (ids, days, hours, comment_lengths, change_versions) = ([], [], [], [], [])
+    user_comments = []
+    os.makedirs(folder)
+    with open(os.path.join(folder, COMMENTS_FILE), 'wb') as comments_file:
+        for (user_id, id, date, working_hours, comment, change_version) in query:
+            if not users or users[-1] != user_id:
+                if user_comments:
+                    comments_file.write(zlib.compress(b''.join(user_comments)))
+                    user_comments = []
+                users.append(user_id)
+                user_offsets.append(len(ids))
+                comment_offsets.append(comments_file.tell())
+            comment = (comment or '').encode('utf-8')
+            ids.append(id)
+            days.append(date.toordinal() - first_day)
+            hours.append(working_hours)
+            comment_lengths.append(len(comment))
+            change_versions.append(change_version)
+            user_comments.append(comment)
+        if users:
+            comments_file.write(zlib.compress(b''.join(user_comments)))
+        user_offsets.append(len(ids))
+        comment_offsets.append(comments_file.tell())
+
+    columns = {
+        'users': numpy.array(users, dtype=numpy.int32),
+        'user_offsets': numpy.array(user_offsets, dtype=numpy.int64),
+        'comment_offsets': numpy.array(comment_offsets, dtype=numpy.int64),
+        'id': numpy.array(ids, dtype=numpy.int64),
+        'day': numpy.array(days, dtype=numpy.uint16),
+        'working_hours': numpy.array(hours, dtype=numpy.float64),
+        'comment_length': numpy.array(comment_lengths, dtype=numpy.uint16)
+    }
+    for (name, values) in columns.items():
+        numpy.save(os.path.join(folder, f'{name}.npy'), values)
+    numpy.save(os.path.join(folder, CHANGE_VERSION_FILE), numpy.array(change_versions, dtype=numpy.int64))
+    return len(ids)
+
+
+def archive_year(year):
+    """
+    This method moves the records of the year from the database to the archive.
+    The files are written to a temporary folder first and are only moved in place together with the commit,
+    so readers find the records either in the database or in the archive. The records keep their change versions,
+    so the change feed sends them like before (clients, which already have them, do not need tombstones).
+    """
+    folder = year_folder(year)
+    temporary_folder = f'{folder}.tmp'
+    shutil.rmtree(temporary_folder, ignore_errors=True)
+    records = write_archive(year, temporary_folder)
+
+    try:
+        deleted = db.session.query(WorkingHours) \
+            .filter(WorkingHours.date >= datetime.date(year, 1, 1), WorkingHours.date <= datetime.date(year, 12, 31)) \
+            .delete(synchronize_session=False)
+        if deleted != records:
+            raise RuntimeError(f'The records of {year} were changed during the archiving. Please try again.')
+        db.session.add(ArchivedYear(year=year, records=records))
+        # the records look differently (they can not be edited anymore), so all cached pages are outdated
+        mark_changed(None)
+        db.session.flush()
+        os.replace(temporary_folder, folder)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        shutil.rmtree(temporary_folder, ignore_errors=True)
+        shutil.rmtree(folder, ignore_errors=True)
+        raise
+    return records
@@ -0,0 +1,59 @@
+"""
+Small in-process caches used by the application
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache(object):
+    """
+    This class is a bounded cache, which forgets the least recently used entries if it is full.
+    Every entry is only valid for the given number of seconds (time to live).
+    It can be used by many threads at the same time.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        This method returns the cached value of the key, if it is still valid. Otherwise, the default is returned.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        """
+        This method stores the value for the key. If the cache is full, the least recently used entry is removed.
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        This method removes the entry of the key, if there is one.
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """
+        This method removes all entries.
+        """
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,64 @@
+"""
+Maintenance commands for the flask command line interface
+"""
+
+from app import db
+from app.health import wait_for_database
+from app.models import ArchivedYear, MonthlySummary, User, WorkingHours
+import click
+import datetime
+from flask import Blueprint, current_app
+from flask_migrate import upgrade
+
+# commands are registered directly as flask commands (e.g. flask rebuild-summaries)
+bp = Blueprint('commands', __name__, cli_group=None)
+
+
+@bp.cli.command('rebuild-summaries')
+@click.option('--user', 'username', help='Rebuild only the summaries of this user')
+def rebuild_summaries_command(username):
+    """
+    Recalculate the monthly summaries of worked days and hours from all records.
+    """
+    user_id = None
+    if username is not None:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f'There is no user {username}.')
+        user_id = user.id
+
+    MonthlySummary.rebuild(user_id)
+    db.session.commit()
+    click.echo('Monthly summaries rebuilt.')
+
+
+@bp.cli.command('prepare-database')
+@click.option('--timeout', type=float, help='Seconds to wait for the database (default: DATABASE_STARTUP_TIMEOUT)')
+def prepare_database_command(timeout):
+    """
+    Wait until the database is reachable and apply all migrations shipped with the application.
+    """
+    if not wait_for_database(timeout if timeout is not None else current_app.config['DATABASE_STARTUP_TIMEOUT']):
+        raise click.ClickException('The database is not reachable.')
+    upgrade()
+    click.echo('Database is up to date.')
+
+
+@bp.cli.command('archive-year')
+@click.argument('year', type=int)
+def archive_year_command(year):
+    """
+    Move the records of working hours of a closed year from the database to compressed column files.
+    """
+    if year >= datetime.date.today().year:
+        raise click.ClickException('Only years before the current year can be archived.')
+    if ArchivedYear.query.get(year) is not None:
+        raise click.ClickException(f'The year {year} is already archived.')
+    if WorkingHours.query.filter(WorkingHours.date >= datetime.date(year, 1, 1),
+                                 WorkingHours.date <= datetime.date(year, 12, 31)).first() is None:
+        raise click.ClickException(f'There are no records of {year}.')
+
+    # numpy is only loaded, when it is needed
+    from app.archive import archive_year
+    records = archive_year(year)
+    click.echo(f'{records} records of {year} archived to {current_app.config["ARCHIVE_FOLDER"]}.')
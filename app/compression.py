@@ -0,0 +1,145 @@
+"""
+Compression of responses and caching of static files
+"""
+
+import click
+import gzip
+import hashlib
+import mimetypes
+import os
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# only text based content is worth to be compressed (images are already compressed)
+COMPRESSIBLE_MIMETYPES = ('text/', 'application/json', 'application/javascript', 'application/x-ndjson',
+                          'image/svg+xml')
+# encodings of precompressed static files with their file suffix, ordered by preference
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# content hashes of static files by their filename
+static_hashes = {}
+
+bp = Blueprint('compression', __name__, cli_group=None)
+
+
+def is_compressible(mimetype):
+    """
+    This method checks, if content of the given mimetype should be compressed
+    """
+    return mimetype is not None and mimetype.startswith(COMPRESSIBLE_MIMETYPES)
+
+
+def compress(data, encoding, best=False):
+    """
+    This method compresses the data with the given encoding (br or gzip).
+    Responses are compressed with the configured (fast) level, static files with the best possible one.
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else current_app.config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=9 if best else current_app.config['COMPRESS_LEVEL'])
+
+
+def negotiate_encoding():
+    """
+    This method chooses the best encoding, which is accepted by the client. None, if no encoding is accepted.
+    """
+    if brotli is not None and 'br' in request.accept_encodings:
+        return 'br'
+    if 'gzip' in request.accept_encodings:
+        return 'gzip'
+    return None
+
+
+@bp.after_app_request
+def compress_response(response):
+    """
+    Responses of the application are compressed, if the client accepts it and they are large enough.
+    Streamed responses and files (static files are precompressed) are sent as they are.
+    """
+    response.vary.add('Accept-Encoding')
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed \
+            or 'Content-Encoding' in response.headers or not is_compressible(response.mimetype):
+        return response
+
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # the compressed content differs byte by byte, so the ETag can only be a weak one
+    (etag, weak) = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@bp.app_template_global()
+def static_url(filename):
+    """
+    This method creates the URL of a static file with a hash of its content.
+    If the file changes, the URL changes, so that the file can be cached forever by the browser.
+    """
+    if filename not in static_hashes:
+        with open(os.path.join(current_app.static_folder, filename), 'rb') as file:
+            static_hashes[filename] = hashlib.sha256(file.read()).hexdigest()[:12]
+    return url_for('static', filename=filename, v=static_hashes[filename])
+
+
+def send_static_file(filename):
+    """
+    This method replaces the default view of static files.
+    If the file was precompressed with an accepted encoding, the compressed file is sent.
+    Files requested with a content hash are cached forever by the browser.
+    """
+    response = None
+    for (encoding, suffix) in STATIC_ENCODINGS:
+        if encoding in request.accept_encodings and os.path.isfile(os.path.join(current_app.static_folder, filename + suffix)):
+            response = send_from_directory(current_app.static_folder, filename + suffix,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = current_app.send_static_file(filename)
+
+    response.vary.add('Accept-Encoding')
+    if 'v' in request.args:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
+
+@bp.record_once
+def replace_static_view(state):
+    state.app.view_functions['static'] = send_static_file
+
+
+@bp.cli.command('compress-static')
+def compress_static_command():
+    """
+    Create precompressed variants (.gz & .br) of all compressible static files.
+    """
+    for (folder, _, filenames) in os.walk(current_app.static_folder):
+        for filename in filenames:
+            path = os.path.join(folder, filename)
+            if filename.endswith(tuple(suffix for (_, suffix) in STATIC_ENCODINGS)) \
+                    or not is_compressible(mimetypes.guess_type(filename)[0]):
+                continue
+
+            with open(path, 'rb') as file:
+                data = file.read()
+            for (encoding, suffix) in STATIC_ENCODINGS:
+                if encoding == 'br' and brotli is None:
+                    continue
+                with open(path + suffix, 'wb') as file:
+                    file.write(compress(data, encoding, best=True))
+            click.echo(f'Compressed {os.path.relpath(path, current_app.static_folder)}')
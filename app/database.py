@@ -0,0 +1,172 @@
+"""
+Database session, which routes reads to an optional replica and writes to the primary database.
+SQLite databases are configured for concurrent requests (WAL journal, pragmas, pooled connections).
+"""
+
+import datetime
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.expression import UpdateBase
+import time
+from urllib.parse import quote
+
+# HTTP methods of requests, which only read data
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# methods, which are called with every executed SQL statement, its parameters and its duration in seconds
+# (e.g. for metrics & profiles), so that all of them share one timer
+statement_listeners = []
+
+
+def sqlite_pragmas(config, read_only=False):
+    """
+    This method responses with the pragmas, which are executed on every new SQLite connection.
+    With the WAL journal, readers do not block the writer (and vice versa) and synchronous=NORMAL only syncs
+    on checkpoints. Connections, which wait for the lock of a writer, retry for busy_timeout milliseconds.
+    """
+    pragmas = [
+        f'PRAGMA busy_timeout = {config["SQLITE_BUSY_TIMEOUT"]}',
+        f'PRAGMA cache_size = -{config["SQLITE_CACHE_SIZE"]}',
+        f'PRAGMA mmap_size = {config["SQLITE_MMAP_SIZE"]}'
+    ]
+    if not read_only:
+        pragmas += ['PRAGMA journal_mode = WAL', 'PRAGMA synchronous = NORMAL']
+    return pragmas
+
+
+def sqlite_connect_listener(pragmas, read_only):
+    """
+    This method creates the listener for new connections of a SQLite pool
+    """
+    def connect(dbapi_connection, connection_record):
+        # the driver must not begin transactions on its own, they are begun by begin_sqlite_transaction()
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+        connection_record.info['sqlite_read_only'] = read_only
+    return connect
+
+
+@event.listens_for(Engine, 'begin')
+def begin_sqlite_transaction(connection):
+    """
+    Reading requests (and read-only connections) begin deferred transactions, which never block.
+    Writing requests take the write lock of SQLite with their first statement, which is not a SELECT (see
+    take_sqlite_write_lock). So concurrent writers wait for each other (busy_timeout) instead of failing with
+    "database is locked", when a read transaction can not be upgraded, but the lock is not held while a request
+    only reads (e.g. while a password is hashed). Outside of requests (e.g. commands), the lock is taken at once.
+    """
+    info = connection.connection.info
+    if 'sqlite_read_only' not in info:
+        return
+    reading = info['sqlite_read_only'] or (has_request_context() and request.method in READ_METHODS)
+    info['sqlite_begin_on_write'] = not reading and has_request_context()
+    if not info['sqlite_begin_on_write']:
+        connection.connection.execute('BEGIN' if reading else 'BEGIN IMMEDIATE')
+
+
+def take_sqlite_write_lock(connection, statement, context):
+    """
+    The transaction of a writing request is begun (with the write lock) right before its first writing statement
+    or its first SELECT ... FOR UPDATE (which SQLite does not support, so the lock of the whole database is taken).
+    Its other SELECT statements before run in autocommit mode, so they hold no lock either.
+    """
+    info = connection.connection.info
+    if not info.get('sqlite_begin_on_write'):
+        return
+    for_update = context is not None and context.compiled is not None \
+        and getattr(context.compiled.statement, '_for_update_arg', None) is not None
+    if for_update or statement.lstrip()[:6].upper() != 'SELECT':
+        info['sqlite_begin_on_write'] = False
+        connection.connection.execute('BEGIN IMMEDIATE')
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement(connection, cursor, statement, parameters, context, executemany):
+    """
+    Before a statement is executed, the write lock of SQLite is taken if needed and the timer of the statement starts
+    """
+    take_sqlite_write_lock(connection, statement, context)
+    connection.info['statement_start'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def finish_statement(connection, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - connection.info.pop('statement_start')
+    for listener in statement_listeners:
+        listener(statement, parameters, duration)
+
+
+@event.listens_for(Engine, 'commit')
+@event.listens_for(Engine, 'rollback')
+def end_sqlite_transaction(connection):
+    """
+    A transaction, which never wrote, was not begun in the database, so there is nothing to end but the flag
+    """
+    connection.connection.info.pop('sqlite_begin_on_write', None)
+
+
+class RoutingSession(SignallingSession):
+    """
+    This session uses the replica for reads, if it was allowed with use_replica() in the current request.
+    As soon as something is written, the session sticks to the primary database until it is removed,
+    so that the request reads its own changes.
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if self.info.get('use_replica') and not self.info.get('wrote'):
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info['wrote'] = True
+            elif 'replica' in self.app.config['SQLALCHEMY_BINDS']:
+                return self.db.get_engine(self.app, bind='replica')
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """
+    This extension creates RoutingSessions, which read from the replica unless the user has written data recently
+    """
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        """
+        SQLite files (with SQLITE_WAL) use a pool of connections, which are prepared with the pragmas of the profile.
+        A URL with the query mode=ro (e.g. the replica) is opened read-only, so it never takes a lock of a writer.
+        """
+        (sa_url, options) = super().apply_driver_hacks(app, sa_url, options)
+        if sa_url.drivername != 'sqlite' or sa_url.database in (None, '', ':memory:') \
+                or not app.config['SQLITE_WAL']:
+            return sa_url, options
+
+        read_only = sa_url.query.get('mode') == 'ro'
+        if read_only and not sa_url.database.startswith('file:'):
+            sa_url = sa_url.set(database=f'file:{quote(sa_url.database)}', query={'mode': 'ro', 'uri': 'true'})
+        options = dict(options, poolclass=QueuePool, pool_size=app.config['SQLITE_POOL_SIZE'],
+                       max_overflow=app.config['SQLITE_POOL_SIZE'], pool_pre_ping=False,
+                       connect_args=dict(options.get('connect_args', {}), check_same_thread=False),
+                       pool_events=[(sqlite_connect_listener(sqlite_pragmas(app.config, read_only), read_only),
+                                     'connect')])
+        return sa_url, options
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def use_replica(self, user):
+        """
+        This method allows the current request to read from the replica.
+        If the user has changed data within the last seconds, the primary database is still used (read-your-writes).
+        The time of the last change (data_modified) is loaded from the primary database, so that the next request
+        reads its own writes also in another worker process.
+        """
+        sticky_seconds = current_app.config['REPLICA_STICKY_SECONDS']
+        if user.data_modified is None \
+                or user.data_modified < datetime.datetime.utcnow() - datetime.timedelta(seconds=sticky_seconds):
+            self.session.info['use_replica'] = True
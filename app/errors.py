@@ -2,32 +2,34 @@
 Default error handling, on error responses by server
 """
 
-from flask import jsonify, render_template, request
-from app import app, db
+from flask import Blueprint, current_app, jsonify, render_template, request
+from app import db
 
+bp = Blueprint('errors', __name__)
 
-@app.errorhandler(404)
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     """
     This method is called by flask on a 404 error.
     If it demands an HTML Page, the error page is rendered.
     Otherwise, a generic json 404 response is provided.
     """
-    app.logger.error(error)
+    current_app.logger.error(error, extra={'sample_rate': current_app.config['LOG_NOT_FOUND_SAMPLE_RATE']})
     if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
         return jsonify({ 'error': 'Not found' }), 404
     else:
         return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     """
     This method is called by flask on a 500 error.
     If it demands an HTML Page, the error page is rendered.
     Otherwise, a generic json 500 response is provided.
     """
-    app.logger.error(error)
+    current_app.logger.error(error, exc_info=error.original_exception)
     db.session.rollback()
     if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
         return jsonify({ 'error': 'Internal Server Error' }), 500
@@ -0,0 +1,112 @@
+"""
+Streaming exports of working hours as CSV or NDJSON
+"""
+
+from app import db
+from app.models import ArchivedYear, User, WorkingHours
+import click
+import csv
+from flask import Blueprint, current_app
+import heapq
+import io
+import json
+import sys
+
+# the export is a flask command (flask export-working-hours)
+bp = Blueprint('exports', __name__, cli_group=None)
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+EXPORT_COLUMNS = ('id', 'user_id', 'date', 'working_hours', 'comment')
+
+
+def export_query(user_id=None, date_from=None, date_to=None):
+    """
+    This method creates the query for an export. Only the needed columns are selected (no ORM objects are built)
+    and the rows are fetched in batches with a server-side cursor, so that memory stays constant.
+    """
+    query = db.session.query(WorkingHours.id, WorkingHours.user_id, WorkingHours.date, WorkingHours.working_hours,
+                             WorkingHours.comment)
+    if user_id is not None:
+        query = query.filter(WorkingHours.user_id == user_id)
+    if date_from is not None:
+        query = query.filter(WorkingHours.date >= date_from)
+    if date_to is not None:
+        query = query.filter(WorkingHours.date <= date_to)
+    return query.order_by(WorkingHours.user_id, WorkingHours.date).yield_per(current_app.config['EXPORT_BATCH_SIZE'])
+
+
+def export_rows(user_id=None, date_from=None, date_to=None):
+    """
+    This method responses with the rows of an export (like export_query) including the records of archived years.
+    The archived rows are merged by user & date with the rows of the database, so the order stays the same.
+    """
+    query = export_query(user_id, date_from, date_to)
+    years = ArchivedYear.years(date_from, date_to)
+    if not years:
+        return query
+
+    # numpy is only loaded, when archived records are read the first time
+    from app.archive import read_archive
+    archived = [read_archive(year).rows(user_id, date_from, date_to) for year in years]
+    return heapq.merge(*archived, query, key=lambda row: (row[1], row[2]))
+
+
+def generate_export(query, export_format):
+    """
+    This generator yields the rows of the given query in the given format.
+    Rows are collected to chunks of one batch, so that not every single line causes a write.
+    """
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv':
+        writer.writerow(EXPORT_COLUMNS)
+
+    for count, (id, user_id, date, working_hours, comment) in enumerate(query, start=1):
+        date = date.strftime('%d.%m.%Y')
+        if export_format == 'csv':
+            writer.writerow((id, user_id, date, working_hours, comment or ''))
+        else:
+            buffer.write(json.dumps({'id': id, 'user_id': user_id, 'date': date, 'working_hours': working_hours,
+                                     'comment': comment or ''}))
+            buffer.write('\n')
+
+        # the collected chunk is handed out and the buffer is reset
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell() > 0:
+        yield buffer.getvalue()
+
+
+@bp.cli.command('export-working-hours')
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS.keys())), default='csv',
+              help='Format of the export')
+@click.option('--user', 'username', help='Export only the records of this user')
+@click.option('--from', 'date_from', type=click.DateTime(formats=['%Y-%m-%d']), help='First date (YYYY-MM-DD)')
+@click.option('--to', 'date_to', type=click.DateTime(formats=['%Y-%m-%d']), help='Last date (YYYY-MM-DD)')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='File to write to (default: stdout)')
+def export_working_hours_command(export_format, username, date_from, date_to, output):
+    """
+    Export tracked working hours of all users (or a single user) as CSV or NDJSON.
+    """
+    user_id = None
+    if username is not None:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f'There is no user {username}.')
+        user_id = user.id
+
+    query = export_rows(user_id, date_from and date_from.date(), date_to and date_to.date())
+    stream = open(output, 'w', newline='') if output else sys.stdout
+    try:
+        for chunk in generate_export(query, export_format):
+            stream.write(chunk)
+    finally:
+        if output:
+            stream.close()
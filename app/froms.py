@@ -8,7 +8,7 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, EmailField, DateField, FloatField
 from wtforms.validators import DataRequired, Email, EqualTo, NumberRange, Length, ValidationError
 from wtforms.widgets import NumberInput
-from app.models import User, WorkingHours
+from app.models import User
 
 
 class LoginForm(FlaskForm):
@@ -65,14 +65,6 @@ class WorkingHoursForm(FlaskForm):
     comment = StringField('Comment')
     submit = SubmitField('Add')
 
-    def validate_date(self, date):
-        """
-        This method validates if there is no entry of this user on the given date already.
-        """
-        hour = WorkingHours.query.filter_by(user_id=current_user.id, date=date.data).first()
-        if hour is not None:
-            raise ValidationError('There is already an entry for this date.')
-
 
 class EditWorkingHoursForm(FlaskForm):
     """
@@ -0,0 +1,92 @@
+"""
+Health checks for orchestrators (liveness & readiness) and waiting for the database on startup
+"""
+
+from alembic.util import CommandError
+from app import db
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+import os
+import time
+
+bp = Blueprint('health', __name__)
+
+
+def database_error():
+    """
+    This method tries to execute a query on the primary database.
+    It responses with the error, if the database is not reachable, otherwise with None.
+    """
+    try:
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+        return None
+    except SQLAlchemyError as error:
+        return error
+
+
+def wait_for_database(timeout, initial_delay=0.1, max_delay=5.0):
+    """
+    This method waits until the database is reachable. The delay between the attempts is doubled every time
+    (up to max_delay), so a running database is found immediately and a starting one is not flooded with connections.
+    It responses with False, if the database is still not reachable after the timeout (in seconds).
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        error = database_error()
+        if error is None:
+            return True
+        if time.monotonic() + delay > deadline:
+            current_app.logger.error(f'Database is not reachable: {error}')
+            return False
+        current_app.logger.warning(f'Database is not reachable yet, next attempt in {delay:.1f}s')
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+def schema_is_current():
+    """
+    This method checks, if all migrations shipped with the application are applied to the database.
+    As migrations are never removed, a positive result is remembered.
+    The migrations are found next to the package (and not in the working directory of the process).
+    """
+    if current_app.extensions.get('schema_is_current'):
+        return True
+
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    directory = os.path.join(os.path.dirname(current_app.root_path), 'migrations')
+    script = ScriptDirectory.from_config(current_app.extensions['migrate'].migrate.get_config(directory))
+    with db.engine.connect() as connection:
+        applied = set(MigrationContext.configure(connection).get_current_heads())
+    current_app.extensions['schema_is_current'] = applied == set(script.get_heads())
+    return current_app.extensions['schema_is_current']
+
+
+@bp.route('/healthz')
+def healthz():
+    """
+    Liveness: the process is able to answer requests (the database is not checked)
+    """
+    return jsonify({'status': 'ok'})
+
+
+@bp.route('/readyz')
+def readyz():
+    """
+    Readiness: the database is reachable with a connection of the pool and all migrations are applied
+    """
+    error = database_error()
+    if error is not None:
+        return jsonify({'status': 'unavailable', 'error': 'Database is not reachable.'}), 503
+    try:
+        if not schema_is_current():
+            return jsonify({'status': 'unavailable', 'error': 'Database migrations are not applied.'}), 503
+    except SQLAlchemyError:
+        return jsonify({'status': 'unavailable', 'error': 'Database is not reachable.'}), 503
+    except CommandError:
+        current_app.logger.exception('Database migrations are not readable')
+        return jsonify({'status': 'unavailable', 'error': 'Database migrations are not readable.'}), 503
+    return jsonify({'status': 'ok'})
@@ -0,0 +1,147 @@
+"""
+Logging of the application as JSON lines.
+Records are only put into a queue by the request threads, a background thread writes them to stderr.
+Every (gunicorn) worker writes its lines to the same stderr of the container, so no worker rotates a file of another one.
+"""
+
+import atexit
+import datetime
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from flask import g, has_request_context, request, session
+from flask.logging import default_handler
+from sqlalchemy import inspect
+
+# header with the id of a request (may be given by a proxy in front of the application)
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+
+def current_user_id():
+    """
+    This method responses with the id of the user of the current request without loading anything from the database.
+    Users of the WebAPI are set by flask_httpauth, users of the web pages are stored in the session by flask_login.
+    """
+    user = g.get('flask_httpauth_user')
+    # with wrong credentials, flask_httpauth stores the (error) response of verify_password instead of a user
+    state = inspect(user, raiseerr=False) if user is not None else None
+    identity = state.identity if state is not None else None
+    if identity is not None:
+        return identity[0]
+    user_id = session.get('_user_id')
+    return int(user_id) if user_id is not None else None
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    This filter adds the request id, user & route to every record logged within a request.
+    Records with a sample_rate (e.g. for frequent 404 errors) are only logged by chance.
+    """
+
+    def filter(self, record):
+        sample_rate = getattr(record, 'sample_rate', 1.0)
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            return False
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.user_id = current_user_id()
+            record.method = request.method
+            record.route = request.url_rule.rule if request.url_rule is not None else None
+            record.path = request.path
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    This formatter creates one line of JSON per record
+    """
+
+    FIELDS = ('request_id', 'user_id', 'method', 'route', 'path', 'status', 'latency_ms')
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'location': f'{record.pathname}:{record.lineno}'
+        }
+        for field in self.FIELDS:
+            if getattr(record, field, None) is not None:
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LogQueue(object):
+    """
+    This class connects the queue handler of the application with a listener thread, which writes into the handlers.
+    Threads do not survive a fork, so every (gunicorn) worker process starts its own listener.
+    """
+
+    def __init__(self, handler, *handlers):
+        self.handler = handler
+        self.handlers = handlers
+        self.listener = None
+        self.start()
+        os.register_at_fork(after_in_child=self.start)
+        # records still in the queue are written before the process exits
+        atexit.register(self.stop)
+
+    def start(self):
+        self.handler.queue = queue.SimpleQueue()
+        self.listener = QueueListener(self.handler.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        self.listener.stop()
+
+
+def add_handlers(app):
+    """
+    This method adds a queue handler to the logger of the application, which passes the records to stderr
+    """
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setLevel(logging.INFO)
+
+    # the record is formatted in the request thread, the listener only writes the line
+    queue_handler = QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.setFormatter(JSONFormatter())
+    app.extensions['log_queue'] = LogQueue(queue_handler, stream_handler)
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(queue_handler)
+    app.logger.setLevel(logging.INFO)
+
+
+def configure_logging(app):
+    """
+    This method sets up logging to stderr and logs every request with its latency.
+    All applications of the package share one logger, so its handlers are only added by the first application.
+    """
+    if not any(isinstance(handler, QueueHandler) for handler in app.logger.handlers):
+        add_handlers(app)
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+
+    @app.after_request
+    def log_request(response):
+        if 'request_id' not in g:
+            return response
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+        if app.config['LOG_REQUESTS']:
+            sample_rate = app.config['LOG_NOT_FOUND_SAMPLE_RATE'] if response.status_code == 404 else 1.0
+            app.logger.info(f'{request.method} {request.path} {response.status_code}', extra={
+                'status': response.status_code,
+                'latency_ms': round((time.perf_counter() - g.request_start) * 1000, 3),
+                'sample_rate': sample_rate
+            })
+        return response
@@ -0,0 +1,108 @@
+"""
+Prometheus metrics of requests, database & password hashing.
+If gunicorn runs several worker processes, PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py),
+so that every worker writes its values to files and /metrics collects them from all workers.
+"""
+
+from app.database import statement_listeners
+from flask import Blueprint, g, has_request_context, request
+import os
+from prometheus_client import CollectorRegistry, Counter, Histogram, CONTENT_TYPE_LATEST, REGISTRY, \
+    generate_latest, multiprocess
+from sqlalchemy.pool import QueuePool
+import time
+
+# buckets for latencies from one millisecond to ten seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+REQUESTS = Counter('tima_http_requests_total', 'Number of HTTP requests',
+                   ['method', 'endpoint', 'status'])
+REQUEST_LATENCY = Histogram('tima_http_request_duration_seconds', 'Latency of HTTP requests',
+                            ['method', 'endpoint'], buckets=LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram('tima_http_request_sql_queries', 'Number of SQL statements per HTTP request',
+                            ['endpoint'], buckets=QUERY_BUCKETS)
+REQUEST_SQL_TIME = Histogram('tima_http_request_sql_duration_seconds', 'Time spent in SQL statements per HTTP request',
+                             ['endpoint'], buckets=LATENCY_BUCKETS)
+SQL_QUERIES = Counter('tima_sql_queries_total', 'Number of SQL statements (also outside of requests)')
+POOL_CHECKOUT_WAIT = Histogram('tima_db_pool_checkout_wait_seconds',
+                               'Time waited for a connection of the database pool', buckets=LATENCY_BUCKETS)
+PASSWORD_HASH_TIME = Histogram('tima_password_hash_duration_seconds', 'Time to hash or verify a password',
+                               ['operation'], buckets=LATENCY_BUCKETS)
+
+
+class TimedQueuePool(QueuePool):
+    """
+    This connection pool measures, how long a checkout waits for a free connection
+    (including the time to open a new connection, if the pool is not full yet)
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+bp = Blueprint('metrics', __name__)
+
+
+@bp.record_once
+def use_timed_pool(state):
+    """
+    The engine is created on first use, so the pool class can still be changed when the blueprint is registered.
+    SQLite files get their queue pool from RoutingSQLAlchemy.apply_driver_hacks (with SQLITE_WAL), which replaces
+    this pool class, so waiting for their connections is not measured.
+    """
+    config = state.app.config
+    if not config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(config['SQLALCHEMY_ENGINE_OPTIONS'], poolclass=TimedQueuePool)
+
+
+def count_statement(statement, parameters, duration):
+    SQL_QUERIES.inc()
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_time += duration
+
+
+statement_listeners.append(count_statement)
+
+
+@bp.before_app_request
+def start_query_count():
+    """
+    The statements of the request are counted, its start is measured by create_app()
+    """
+    g.sql_queries = 0
+    g.sql_time = 0.0
+
+
+@bp.after_app_request
+def record_request_metrics(response):
+    """
+    The metrics are labeled with the endpoint (not the URL), so that the number of time series stays small
+    """
+    if 'sql_queries' not in g:
+        return response
+    endpoint = request.endpoint or 'none'
+    REQUESTS.labels(request.method, endpoint, response.status_code).inc()
+    REQUEST_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - g.request_start)
+    REQUEST_QUERIES.labels(endpoint).observe(g.sql_queries)
+    REQUEST_SQL_TIME.labels(endpoint).observe(g.sql_time)
+    return response
+
+
+@bp.route('/metrics')
+def metrics():
+    """
+    This method responses with all metrics in the text format of Prometheus.
+    With multiple processes, the values of all (also already stopped) workers are aggregated.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
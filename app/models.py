@@ -4,11 +4,91 @@ Different database models used in the application
 import datetime
 
 from app import db, login
+from app.caching import TTLCache
+from app.passwords import hash_password, needs_rehash, verify_password
 import base64
 from datetime import timedelta
+from flask import current_app
 from flask_login import UserMixin
 import os
-from werkzeug.security import check_password_hash, generate_password_hash
+from sqlalchemy import event, extract, func, insert, inspect, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+
+
+def token_cache():
+    """
+    This method responses with the cache of the current application, which maps verified tokens
+    to the id, the expiration time and the column values of their user
+    """
+    if 'token_cache' not in current_app.extensions:
+        current_app.extensions['token_cache'] = TTLCache(current_app.config['TOKEN_CACHE_SIZE'],
+                                                         current_app.config['TOKEN_CACHE_TIMEOUT'])
+    return current_app.extensions['token_cache']
+
+
+def user_cache():
+    """
+    This method responses with the cache of the current application, which maps ids of users to their column values
+    """
+    if 'user_cache' not in current_app.extensions:
+        current_app.extensions['user_cache'] = TTLCache(current_app.config['USER_CACHE_SIZE'],
+                                                        current_app.config['USER_CACHE_TIMEOUT'])
+    return current_app.extensions['user_cache']
+
+
+# methods, which are called with the ids of users after their data was changed in a committed transaction
+change_listeners = []
+
+
+def mark_changed(user_id, connection=None):
+    """
+    This method remembers, that data (profile or working hours) of the user is changed in the current transaction.
+    If None is given, the working hours of all users are changed.
+    The data version of the user is increased in the same transaction (within a flush, its connection must be given).
+    """
+    db.session.info.setdefault('changed_users', set()).add(user_id)
+
+    statement = update(User.__table__).values(data_version=User.data_version + 1,
+                                              data_modified=datetime.datetime.utcnow())
+    if user_id is not None:
+        statement = statement.where(User.id == user_id)
+    (connection or db.session).execute(statement)
+
+
+def current_data_version(user_id):
+    """
+    This method responses with a subquery of the data version of the user. Within a transaction, which already
+    increased the version (see mark_changed), it is the version of the changes of this transaction.
+    """
+    return select(User.data_version).where(User.id == user_id).scalar_subquery()
+
+
+@event.listens_for(db.session, 'after_commit')
+def notify_change_listeners(session):
+    """
+    After a commit, all change listeners are informed about the users with changed data.
+    Savepoints also dispatch this event, but their changes are only visible to others after the outer commit.
+    """
+    if session.in_nested_transaction():
+        return
+    user_ids = session.info.pop('changed_users', None)
+    if user_ids:
+        for listener in change_listeners:
+            listener(user_ids)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_changes(session):
+    """
+    After a rollback, the changes are discarded without informing anyone.
+    After the rollback of a savepoint, the changes before the savepoint are still remembered.
+    """
+    if session.in_nested_transaction():
+        return
+    session.info.pop('changed_users', None)
 
 
 class User(UserMixin, db.Model):
@@ -26,19 +106,28 @@ class User(UserMixin, db.Model):
     target_time = db.Column(db.Float)
     token = db.Column(db.String(32), index=True, unique=True)
     token_expiration = db.Column(db.DateTime)
+    # increased & updated on every change of the profile or working hours of the user (used for ETags of the WebAPI)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    data_modified = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     working_hours = db.relationship('WorkingHours', backref='employee', lazy='dynamic')
 
     def set_password(self, password):
         """
         Set password of the user
         """
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         """
-        Check correctness of provided password
+        Check correctness of provided password.
+        If the stored hash was created with outdated parameters, it is replaced by a new hash of the password
+        (the caller has to commit the change).
         """
-        return check_password_hash(self.password_hash, password)
+        if not verify_password(self.password_hash, password):
+            return False
+        if needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
 
     def get_token(self, expires_in=3600):
         """
@@ -65,13 +154,40 @@ class User(UserMixin, db.Model):
         """
         This method checks the validity of a provided token.
         It must be the token of this user & the expiration time must be in the future.
+        Verified tokens are cached, so that the user is only loaded from the database again after the cache timeout.
         :return:
         """
+        cached = token_cache().get(token)
+        if cached is not None:
+            (user_id, token_expiration, state) = cached
+            if token_expiration < datetime.datetime.utcnow():
+                token_cache().delete(token)
+                return None
+            return User.from_cached_state(state)
+
         user = User.query.filter_by(token=token).first()
         if user is None or user.token_expiration < datetime.datetime.utcnow():
             return None
+        token_cache().set(token, (user.id, user.token_expiration, user.cached_state()))
         return user
 
+    def cached_state(self):
+        """
+        This method responses with the column values of the user, which may be cached.
+        The data version changes with every record of working hours, so it is not cached (but loaded on access).
+        """
+        return {column.key: getattr(self, column.key) for column in User.__table__.columns
+                if column.key not in ('data_version', 'data_modified')}
+
+    @staticmethod
+    def from_cached_state(state):
+        """
+        This method attaches a user with the cached column values to the session without loading it from the database
+        """
+        user = User(**state)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
     def __repr__(self):
         return f'<User {self.username}>'
 
@@ -86,12 +202,33 @@ class User(UserMixin, db.Model):
         }
 
 
+@event.listens_for(User, 'after_update')
+def forget_cached_token(mapper, connection, target):
+    """
+    If a user is changed (e.g. a new token, a revoked token or a new username), the cached token & user are discarded.
+    If the profile data was changed, the data version is increased as well.
+    """
+    state = inspect(target)
+    for token in state.attrs.token.history.sum():
+        token_cache().delete(token)
+    user_cache().delete(target.id)
+    if any(state.attrs[key].history.has_changes() for key in target.to_dict().keys()):
+        mark_changed(target.id, connection)
+
+
 @login.user_loader
 def load_user(user_id):
     """
-    Method to load the user for Flask Login
+    Method to load the user for Flask Login (it is called once per request).
+    The column values of users are cached for a few seconds, so most requests do not load the user from the database.
     """
-    return User.query.get(int(user_id))
+    state = user_cache().get(int(user_id))
+    if state is not None:
+        return User.from_cached_state(state)
+    user = User.query.get(int(user_id))
+    if user is not None:
+        user_cache().set(user.id, user.cached_state())
+    return user
 
 
 class WorkingHours(UserMixin, db.Model):
@@ -100,15 +237,60 @@ class WorkingHours(UserMixin, db.Model):
     It contains many columns listed below.
     user_id is a foreign key from user table.
     """
+    __table_args__ = (db.Index('ix_working_hours_user_id_date', 'user_id', 'date', unique=True),
+                      db.Index('ix_working_hours_user_id_change_version', 'user_id', 'change_version'))
+
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, index=True)
     working_hours = db.Column(db.Float)
     comment = db.Column(db.String(64))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # data version of the user, which contains the last change of the record (used for the change feed of the WebAPI)
+    change_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def __repr__(self):
         return f'<WorkingHours {self.user_id} {self.date}>'
 
+    @staticmethod
+    def lock(id, user_id):
+        """
+        This method loads the record of the user (or None) to change it. The row is locked until the end of the
+        transaction (SQLite takes its write lock), so concurrent changes never compute the change of the monthly
+        summary from the same old value.
+        """
+        return WorkingHours.query.filter_by(id=id, user_id=user_id).with_for_update().populate_existing().first()
+
+    @staticmethod
+    def create(date, working_hours, comment, user_id):
+        """
+        This method inserts a new record with a single statement, relying on the unique index on (user_id, date).
+        If there is already a record of the user for the given date, nothing is inserted and None is returned.
+        The data version is increased in the same savepoint, so it stays unchanged, if nothing is inserted.
+        """
+        values = {'date': date, 'working_hours': working_hours, 'comment': comment, 'user_id': user_id}
+        insert_values = dict(values, change_version=current_data_version(user_id))
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            statement = sqlite_insert(WorkingHours.__table__).values(**insert_values).on_conflict_do_nothing()
+        elif dialect == 'mysql':
+            statement = mysql_insert(WorkingHours.__table__).values(**insert_values).prefix_with('IGNORE')
+        else:
+            # other databases have no common syntax, so the violation of the unique index is caught
+            statement = insert(WorkingHours.__table__).values(**insert_values)
+
+        savepoint = db.session.begin_nested()
+        try:
+            mark_changed(user_id)
+            result = db.session.execute(statement)
+        except IntegrityError:
+            savepoint.rollback()
+            return None
+        if result.rowcount == 0:
+            savepoint.rollback()
+            return None
+        savepoint.commit()
+        return WorkingHours(id=result.inserted_primary_key[0], **values)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -117,3 +299,139 @@ class WorkingHours(UserMixin, db.Model):
             'comment': self.comment or '',
             'user_id': self.user_id
         }
+
+
+class WorkingHoursTombstone(db.Model):
+    """
+    This class represents the table WorkingHoursTombstone in the database.
+    It remembers deleted records of working hours, so that clients of the change feed can remove them as well.
+    """
+    __table_args__ = (db.Index('ix_working_hours_tombstone_user_id_change_version', 'user_id', 'change_version'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    # ids of deleted records may be reused by some databases, so they are not the primary key
+    working_hours_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.Date)
+    change_version = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<WorkingHoursTombstone {self.user_id} {self.date}>'
+
+
+@event.listens_for(db.session, 'before_flush')
+def record_working_hours_changes(session, flush_context, instances):
+    """
+    Before created, changed or deleted records of working hours are written, the data version of their users is
+    increased once per flush. The records get the new version as change version and deleted records leave tombstones.
+    """
+    changed = [hours for hours in session.new.union(session.dirty)
+               if isinstance(hours, WorkingHours) and session.is_modified(hours, include_collections=False)]
+    deleted = [hours for hours in session.deleted if isinstance(hours, WorkingHours)]
+    for user_id in set(hours.user_id for hours in changed + deleted):
+        mark_changed(user_id)
+    for hours in changed:
+        hours.change_version = current_data_version(hours.user_id)
+    session.add_all(WorkingHoursTombstone(working_hours_id=hours.id, user_id=hours.user_id, date=hours.date,
+                                          change_version=current_data_version(hours.user_id)) for hours in deleted)
+
+
+class MonthlySummary(db.Model):
+    """
+    This class represents the table MonthlySummary in the database.
+    It contains the number of worked days and the sum of worked hours of a user per month.
+    The rows are updated in the same transaction as every change of working hours.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    month = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    worked_days = db.Column(db.Integer, nullable=False, default=0)
+    worked_hours = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<MonthlySummary {self.user_id} {self.year}-{self.month}>'
+
+    @staticmethod
+    def record(user_id, date, days=0, hours=0.0):
+        """
+        This method adds the given number of days and hours to the summary of the month of given date.
+        The row is created if it does not exist yet, with a single atomic statement.
+        The data version of the user is increased with the change of the working hours themselves.
+        """
+        table = MonthlySummary.__table__
+        values = {'user_id': user_id, 'year': date.year, 'month': date.month, 'worked_days': days,
+                  'worked_hours': hours}
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            statement = sqlite_insert(table).values(**values)
+            statement = statement.on_conflict_do_update(index_elements=['user_id', 'year', 'month'], set_={
+                'worked_days': table.c.worked_days + statement.excluded.worked_days,
+                'worked_hours': table.c.worked_hours + statement.excluded.worked_hours})
+        elif dialect == 'mysql':
+            statement = mysql_insert(table).values(**values)
+            statement = statement.on_duplicate_key_update(
+                worked_days=table.c.worked_days + statement.inserted.worked_days,
+                worked_hours=table.c.worked_hours + statement.inserted.worked_hours)
+        else:
+            # other databases have no common syntax, so the row is updated and only created if it is missing
+            result = db.session.execute(update(table).where(
+                table.c.user_id == user_id, table.c.year == date.year, table.c.month == date.month).values(
+                worked_days=table.c.worked_days + days, worked_hours=table.c.worked_hours + hours))
+            if result.rowcount > 0:
+                return
+            statement = insert(table).values(**values)
+        db.session.execute(statement)
+
+    @staticmethod
+    def rebuild(user_id=None):
+        """
+        This method recalculates the summaries (of all users or a single user) from the records of working hours.
+        The summaries of archived years are not changed.
+        """
+        year = extract('year', WorkingHours.date)
+        month = extract('month', WorkingHours.date)
+        source = select(WorkingHours.user_id, year, month, func.count(WorkingHours.date),
+                        func.sum(WorkingHours.working_hours)).group_by(WorkingHours.user_id, year, month)
+        # the records of archived years are not in the database anymore, so their summaries are kept
+        delete = MonthlySummary.__table__.delete().where(MonthlySummary.year.notin_(select(ArchivedYear.year)))
+        if user_id is not None:
+            source = source.where(WorkingHours.user_id == user_id)
+            delete = delete.where(MonthlySummary.user_id == user_id)
+
+        mark_changed(user_id)
+        db.session.execute(delete)
+        db.session.execute(insert(MonthlySummary.__table__).from_select(
+            ['user_id', 'year', 'month', 'worked_days', 'worked_hours'], source))
+
+
+class ArchivedYear(db.Model):
+    """
+    This class represents the table ArchivedYear in the database.
+    The records of working hours of an archived year were moved to files (see app/archive.py), only their monthly
+    summaries are kept in the database. Archived years can not be changed anymore.
+    """
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    records = db.Column(db.Integer, nullable=False)
+    archived = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ArchivedYear {self.year}>'
+
+    @staticmethod
+    def contains(date):
+        """
+        This method checks, if the year of the given date is archived
+        """
+        return ArchivedYear.query.get(date.year) is not None
+
+    @staticmethod
+    def years(date_from=None, date_to=None):
+        """
+        This method responses with the sorted list of archived years, which overlap the given dates (inclusive)
+        """
+        query = db.session.query(ArchivedYear.year)
+        if date_from is not None:
+            query = query.filter(ArchivedYear.year >= date_from.year)
+        if date_to is not None:
+            query = query.filter(ArchivedYear.year <= date_to.year)
+        return [year for (year,) in query.order_by(ArchivedYear.year)]
@@ -0,0 +1,79 @@
+"""
+Hashing & verification of passwords in a pool of worker processes
+"""
+
+from app.metrics import PASSWORD_HASH_TIME
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+import threading
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# the pool is created on first use, so that every (forked) server process gets its own pool
+executor = None
+executor_lock = threading.Lock()
+
+
+def hash_method():
+    """
+    This method responses with the configured hash method, e.g. pbkdf2:sha256:260000
+    """
+    return f'{current_app.config["PASSWORD_HASH_ALGORITHM"]}:{current_app.config["PASSWORD_HASH_ITERATIONS"]}'
+
+
+def get_executor(workers):
+    """
+    This method responses with the worker pool of this process and creates it on first use
+    """
+    global executor
+    if executor is None:
+        with executor_lock:
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=workers)
+    return executor
+
+
+def run_in_pool(function, *args):
+    """
+    This method runs the CPU intensive function in the worker pool and waits for the result.
+    Meanwhile, the request thread does not hold the GIL, so other requests are not blocked.
+    If no workers are configured, the function is called directly.
+    If a worker process died (e.g. killed by the OOM killer), the broken pool is replaced and the function is retried.
+    """
+    global executor
+    workers = current_app.config['PASSWORD_HASH_WORKERS']
+    if workers <= 0:
+        return function(*args)
+
+    pool = get_executor(workers)
+    try:
+        return pool.submit(function, *args).result()
+    except BrokenProcessPool:
+        with executor_lock:
+            if executor is pool:
+                executor = None
+        pool.shutdown(wait=False)
+        return get_executor(workers).submit(function, *args).result()
+
+
+def hash_password(password):
+    """
+    This method creates a salted hash of the password with the configured method
+    """
+    with PASSWORD_HASH_TIME.labels('hash').time():
+        return run_in_pool(generate_password_hash, password, hash_method())
+
+
+def verify_password(password_hash, password):
+    """
+    This method checks, if the password matches the hash
+    """
+    with PASSWORD_HASH_TIME.labels('verify').time():
+        return run_in_pool(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """
+    This method checks, if the hash was created with another method than the configured one (e.g. fewer iterations)
+    """
+    return password_hash.split('$', 1)[0] != hash_method()
@@ -0,0 +1,111 @@
+"""
+Profiling of single requests on demand & detection of repeated queries (N+1 problems)
+"""
+
+from app.database import statement_listeners
+from app.models import User
+import cProfile
+import datetime
+import json
+import os
+import re
+import time
+import uuid
+from flask import Blueprint, current_app, g, has_request_context, request
+from flask_login import current_user
+
+# header or query parameter, which switches on the profiling of a request
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ARGUMENT = '_profile'
+
+bp = Blueprint('profiling', __name__)
+
+
+def is_admin():
+    """
+    This method checks, if the request was sent by an administrator (logged in or with a token of the WebAPI)
+    """
+    if current_user.is_authenticated:
+        return current_user.username in current_app.config['ADMINS']
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        user = User.check_token(authorization[len('Bearer '):])
+        return user is not None and user.username in current_app.config['ADMINS']
+    return False
+
+
+def query_shape(statement):
+    """
+    This method normalizes the whitespace of a statement, so that equal queries have the same shape
+    """
+    return re.sub(r'\s+', ' ', statement).strip()
+
+
+def record_statement(statement, parameters, duration):
+    if not has_request_context():
+        return
+    if 'profile_statements' in g:
+        g.profile_statements.append({
+            'statement': statement,
+            'parameters': repr(parameters),
+            'duration_ms': round(duration * 1000, 3)
+        })
+    if 'query_shapes' in g:
+        shape = query_shape(statement)
+        g.query_shapes[shape] = g.query_shapes.get(shape, 0) + 1
+
+
+statement_listeners.append(record_statement)
+
+
+@bp.before_app_request
+def start_profiling():
+    """
+    Administrators can profile a request with the header "X-Profile: 1" or the query parameter "_profile=1",
+    if profiling is enabled in the config. In debug mode (or if configured) the queries of every request are counted.
+    """
+    if current_app.debug or current_app.config['DETECT_REPEATED_QUERIES']:
+        g.query_shapes = {}
+
+    if not current_app.config['PROFILING_ENABLED'] \
+            or not (request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_ARGUMENT)) or not is_admin():
+        return
+    g.profile_statements = []
+    g.profile_start = time.perf_counter()
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+
+
+@bp.after_app_request
+def stop_profiling(response):
+    """
+    The profile is stored in the profiles folder: <name>.prof can be opened with pstats (or e.g. snakeviz),
+    <name>.json contains the executed SQL statements with their timings. The name is sent in the X-Profile header.
+    """
+    if 'query_shapes' in g:
+        for (shape, count) in g.query_shapes.items():
+            if count >= current_app.config['REPEATED_QUERY_THRESHOLD']:
+                current_app.logger.warning(f'Query executed {count} times in {request.method} {request.path}: {shape}')
+
+    if 'profiler' not in g:
+        return response
+    g.profiler.disable()
+    duration = time.perf_counter() - g.profile_start
+
+    folder = current_app.config['PROFILES_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    name = f'{datetime.datetime.utcnow():%Y%m%d-%H%M%S}-{request.endpoint}-{uuid.uuid4().hex[:8]}'
+    g.profiler.dump_stats(os.path.join(folder, f'{name}.prof'))
+    with open(os.path.join(folder, f'{name}.json'), 'w') as file:
+        json.dump({
+            'method': request.method,
+            'url': request.full_path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'sql_duration_ms': round(sum(statement['duration_ms'] for statement in g.profile_statements), 3),
+            'statements': g.profile_statements
+        }, file, indent=2)
+    response.headers[PROFILE_HEADER] = name
+    current_app.logger.info(f'Profile of {request.method} {request.full_path} stored as {name}')
+    return response
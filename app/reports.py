@@ -0,0 +1,84 @@
+"""
+Aggregated reports of working hours, grouped by day, week, month or year
+"""
+
+from app import db
+from app.models import ArchivedYear, WorkingHours
+import datetime
+from sqlalchemy import func, literal_column
+
+REPORT_GROUPS = ('day', 'week', 'month', 'year')
+PERIOD_FORMATS = {'day': '%Y-%m-%d', 'month': '%Y-%m', 'year': '%Y'}
+
+
+def period_expression(group):
+    """
+    This method creates the SQL expression of the period a record belongs to.
+    Weeks are labeled by the date of their monday, all other periods by their date prefix (YYYY-MM-DD, YYYY-MM, YYYY).
+    """
+    date = WorkingHours.date
+    if db.engine.dialect.name == 'sqlite':
+        if group == 'week':
+            # the next sunday (or the day itself) minus six days is the monday of the week
+            return func.date(date, 'weekday 0', '-6 days')
+        return func.strftime(PERIOD_FORMATS[group], date)
+
+    if group == 'week':
+        return func.date_format(func.subdate(date, func.weekday(date)), '%Y-%m-%d')
+    return func.date_format(date, PERIOD_FORMATS[group])
+
+
+def period_label(group, date):
+    """
+    This method responses with the label of the period of the date (like period_expression, but in Python)
+    """
+    if group == 'week':
+        return (date - datetime.timedelta(days=date.weekday())).isoformat()
+    return date.strftime(PERIOD_FORMATS[group])
+
+
+def add_archived_records(totals, user, group, date_from, date_to):
+    """
+    This method adds the records of archived years (which are not in the database anymore) to the sums per period.
+    A week at the turn of the year may contain records of the database and of the archive.
+    """
+    years = ArchivedYear.years(date_from, date_to)
+    if not years:
+        return
+
+    # numpy is only loaded, when archived records are read the first time
+    from app.archive import read_archive
+    for year in years:
+        for row in read_archive(year).rows(user.id, date_from, date_to):
+            label = period_label(group, row.date)
+            (worked_days, worked_hours) = totals.get(label, (0, 0.0))
+            totals[label] = (worked_days + 1, worked_hours + row.working_hours)
+
+
+def create_report(user, group, date_from=None, date_to=None):
+    """
+    This method sums up the working hours of the user per period in the database (and in the archived years).
+    Besides the sums, the target hours and the flextime of every period are calculated.
+    """
+    period = period_expression(group).label('period')
+    query = db.session.query(period, func.count(WorkingHours.date), func.sum(WorkingHours.working_hours)) \
+        .filter(WorkingHours.user_id == user.id)
+    if date_from is not None:
+        query = query.filter(WorkingHours.date >= date_from)
+    if date_to is not None:
+        query = query.filter(WorkingHours.date <= date_to)
+    totals = {label: (worked_days, worked_hours)
+              for (label, worked_days, worked_hours) in query.group_by(literal_column('period')).all()}
+    add_archived_records(totals, user, group, date_from, date_to)
+
+    periods = []
+    for (label, (worked_days, worked_hours)) in sorted(totals.items()):
+        target_hours = worked_days * user.target_time
+        periods.append({
+            'period': label,
+            'worked_days': worked_days,
+            'worked_hours': round(worked_hours, 2),
+            'target_hours': round(target_hours, 2),
+            'flextime': round(worked_hours - target_hours, 2)
+        })
+    return periods
@@ -1,61 +1,67 @@
 """
 All routes for the web application
 """
-from app import app, db
+from app import db
+from app.caching import TTLCache
 from app.froms import LoginForm, RegistrationForm, WorkingHoursForm, EditUserForm, EditWorkingHoursForm, EmptySubmitForm
-from app.models import User, WorkingHours
+from app.models import ArchivedYear, MonthlySummary, User, WorkingHours
 import datetime
 from dateutil.relativedelta import relativedelta
-from flask import redirect, request, render_template, url_for
+from flask import Blueprint, current_app, redirect, request, render_template, url_for
 from flask_login import current_user, login_user, logout_user, login_required
+from markupsafe import Markup
 from sqlalchemy import asc, func
 from werkzeug.urls import url_parse
 from wtforms import Label
 
+bp = Blueprint('main', __name__)
 
-@app.route('/login', methods=['GET', 'POST'])
+
+@bp.route('/login', methods=['GET', 'POST'])
 def login_page():
     """
     This method shows the login page and handles the login form input
     """
     # if the current user is already logged in, redirect to the page with records of working hours
     if current_user.is_authenticated:
-        return redirect(url_for('working_hours_page'))
+        return redirect(url_for('main.working_hours_page'))
 
     form = LoginForm()
     # if the sent form is valid, it is checked for correct credentials before logging in
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         if user is None or not user.check_password(form.password.data):
-            return redirect(url_for('login_page'))
+            return redirect(url_for('main.login_page'))
+        # an upgraded password hash is saved
+        db.session.commit()
 
         login_user(user, remember=form.remember_me.data)
 
         # redirect the user to the previous page (before login) or if not provided to page with records of working hours
         next_page = request.args.get('next')
         if not next_page or url_parse(next_page).netloc != '':
-            next_page = url_for('working_hours_page')
+            next_page = url_for('main.working_hours_page')
         return redirect(next_page)
     return render_template('login.html', form=form)
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     """
     This method logs the current user out
     """
     logout_user()
-    return redirect(url_for('login_page'))
+    return redirect(url_for('main.login_page'))
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register_page():
     """
     This page shows a registration page for new users
     """
     # if the current user is already logged in, redirect to the page with records of working hours
     if current_user.is_authenticated:
-        return redirect(url_for('working_hours_page'))
+        return redirect(url_for('main.working_hours_page'))
 
     form = RegistrationForm()
     # if the submitted form is valid, the new user is created, stored to database and the user is automatically logged in and forwarded to his profile page
@@ -66,18 +72,15 @@ def register_page():
         db.session.commit()
 
         login_user(user)
-        return redirect(url_for('user_page'))
+        return redirect(url_for('main.user_page'))
 
     return render_template('register.html', form=form)
 
 
-@app.route('/')
-@app.route('/working-hours', methods=['GET', 'POST'])
-@login_required
-def working_hours_page():
+def requested_period():
     """
-    This page shows records of working hours of current or selected specific month
-    It includes a form to create new records as well
+    This method responses with the year & month of the query parameters 'year' and 'month'.
+    Invalid or missing parameters are replaced by the current year & month.
     """
     # get current month & year as default values
     current_date = datetime.date.today()
@@ -100,89 +103,147 @@ def working_hours_page():
         except:
             pass
 
-    # calculates the oldest and most recent record entry
-    all_hours = WorkingHours.query.filter_by(user_id=current_user.id).all()
-    all_dates = list(map(lambda x: x.date, all_hours))
-    minimal_date = min(all_dates, default=current_date)
-    maximal_date = max(all_dates, default=current_date)
-
-    # creates a list of all available years (for year selection on the web page)
-    years = []
-    for year in range(minimal_date.year, maximal_date.year + 1):
-        years.append(year)
-
-    # creates a list of all available months (for month selection on the web page)
-    months = []
-    for month in range(1, 13):
-        months.append(datetime.date(2022, month, 1).strftime('%B'))
-
-    # collects all records of the user in the given month of given year sorted by date
-    hours = db.session.query(WorkingHours) \
-        .filter(WorkingHours.user_id == current_user.id) \
-        .filter(WorkingHours.date >= datetime.date(given_year, given_month, 1)) \
-        .filter(WorkingHours.date < (datetime.date(given_year, given_month, 1) + relativedelta(months=+1))) \
+    return (given_year, given_month)
+
+
+def month_names():
+    """
+    This method creates a list of all months (for month selection and the title on the web page)
+    """
+    return [datetime.date(2022, month, 1).strftime('%B') for month in range(1, 13)]
+
+
+def query_month(user_id, year, month):
+    """
+    This method collects all records of the user in the given month of given year sorted by date
+    """
+    first_day = datetime.date(year, month, 1)
+    return db.session.query(WorkingHours) \
+        .filter(WorkingHours.user_id == user_id) \
+        .filter(WorkingHours.date >= first_day) \
+        .filter(WorkingHours.date < (first_day + relativedelta(months=+1))) \
         .order_by(asc(WorkingHours.date)) \
         .all()
 
+
+def fragment_cache():
+    """
+    This method responses with the cache of rendered parts of pages of the current application.
+    Keys contain the data version of the user, so every change of working hours leads to new entries.
+    """
+    if 'fragment_cache' not in current_app.extensions:
+        current_app.extensions['fragment_cache'] = TTLCache(current_app.config['FRAGMENT_CACHE_SIZE'],
+                                                            current_app.config['FRAGMENT_CACHE_TIMEOUT'])
+    return current_app.extensions['fragment_cache']
+
+
+def cache_fragment(key, fragment):
+    """
+    This method stores a rendered part of a page. Only reading requests without uncommitted changes store fragments:
+    a data version increased within the request may still be rolled back and then be used again by the next change.
+    """
+    if request.method == 'GET' and not db.session.info.get('changed_users'):
+        fragment_cache().set(key, fragment)
+
+
+def available_years(user):
+    """
+    This method creates a list of all years from the oldest to the most recent record (for year selection on the web page).
+    The bounds are calculated from the monthly summaries (with their primary key), which include archived years.
+    """
+    key = ('years', user.id, user.data_version)
+    years = fragment_cache().get(key)
+    if years is None:
+        current_year = datetime.date.today().year
+        (minimal_year, maximal_year) = db.session.query(func.min(MonthlySummary.year), func.max(MonthlySummary.year)) \
+            .filter(MonthlySummary.user_id == user.id).one()
+        years = list(range(minimal_year or current_year, (maximal_year or current_year) + 1))
+        cache_fragment(key, years)
+    return years
+
+
+def render_month_table(user, year, month):
+    """
+    This method renders the table with the records of the month. The table is cached until the user changes data.
+    If there are no records in the database, the month may be part of an archived year (its records can not be edited).
+    """
+    key = ('month', user.id, year, month, user.data_version)
+    table = fragment_cache().get(key)
+    if table is None:
+        hours = query_month(user.id, year, month)
+        archived = not hours and ArchivedYear.query.get(year) is not None
+        if archived:
+            # numpy is only loaded, when archived records are read the first time
+            from app.archive import read_archive
+            first_day = datetime.date(year, month, 1)
+            hours = list(read_archive(year).rows(user.id, first_day, first_day + relativedelta(months=+1, days=-1)))
+        table = Markup(render_template('working_hours/month-table.html', hours=hours, archived=archived,
+                                       given_month=month, given_year=year))
+        cache_fragment(key, table)
+    return table
+
+
+@bp.route('/')
+@bp.route('/working-hours', methods=['GET', 'POST'])
+@login_required
+def working_hours_page():
+    """
+    This page shows records of working hours of current or selected specific month
+    It includes a form to create new records as well
+    """
+    # showing the page only reads data, so it can be loaded from the replica database
+    if request.method == 'GET':
+        db.use_replica(current_user)
+
+    (given_year, given_month) = requested_period()
+
     form = WorkingHoursForm()
     # if submitted form is valid, a new record is created with provided data
+    # (the unique index prevents a second record on the same date)
     if form.validate_on_submit():
-        hours = WorkingHours(date=form.date.data, working_hours=form.hours.data, comment=form.comment.data, user_id=current_user.id)
-        db.session.add(hours)
-        db.session.commit()
-        return redirect(url_for('working_hours_page'))
+        if ArchivedYear.contains(form.date.data):
+            form.date.errors.append('The year of this date is archived and can not be changed anymore.')
+        elif WorkingHours.create(date=form.date.data, working_hours=form.hours.data, comment=form.comment.data, user_id=current_user.id) is not None:
+            MonthlySummary.record(current_user.id, form.date.data, days=1, hours=form.hours.data)
+            db.session.commit()
+            return redirect(url_for('main.working_hours_page'))
+        else:
+            form.date.errors.append('There is already an entry for this date.')
 
-    return render_template('working_hours/working-hours.html', form=form, hours=hours, months=months, years=years, given_month=given_month, given_year=given_year)
+    return render_template('working_hours/working-hours.html', form=form, months=month_names(), years=available_years(current_user),
+                           month_table=render_month_table(current_user, given_year, given_month), given_month=given_month, given_year=given_year)
 
 
-@app.route('/edit-working-hours/<working_hours_id>', methods=['GET', 'POST'])
+@bp.route('/edit-working-hours/<working_hours_id>', methods=['GET', 'POST'])
 @login_required
 def edit_working_hours_page(working_hours_id):
     """
     This page allows a user to edit already existing records of working hours.
     """
-    # get current month & year as default values
-    current_date = datetime.date.today()
-    given_month = current_date.month
-    given_year = current_date.year
+    # showing the page only reads data, so it can be loaded from the replica database
+    if request.method == 'GET':
+        db.use_replica(current_user)
 
-    # checks for valid query parameter 'month' (must be between 1 & 12)
-    requested_month = request.args.get('month')
-    if requested_month is not None:
-        try:
-            given_month = min(max(int(requested_month), 1), 12)
-        except:
-            pass
-
-    # checks for valid query parameter 'year' (must be between 2022 & 3000)
-    requested_year = request.args.get('year')
-    if requested_year is not None:
-        try:
-            given_year = min(max(int(requested_year), 2022), 3000)
-        except:
-            pass
+    (given_year, given_month) = requested_period()
+    hours = query_month(current_user.id, given_year, given_month)
 
-    # collects all records of the user in the given month of given year sorted by date
-    hours = db.session.query(WorkingHours) \
-        .filter(WorkingHours.user_id == current_user.id) \
-        .filter(WorkingHours.date >= datetime.date(given_year, given_month, 1)) \
-        .filter(WorkingHours.date < (datetime.date(given_year, given_month, 1) + relativedelta(months=+1))) \
-        .order_by(asc(WorkingHours.date)) \
-        .all()
-    # load the entry to be edited
-    edit_working_hour = WorkingHours.query.filter_by(id=working_hours_id, user_id=current_user.id).first_or_404()
-
-    # if there is no entry, which wants to be edited, the user is redirected to the overview page of records
+    # load the entry to be edited (usually it is one of the records of the shown month)
+    edit_working_hour = next((entry for entry in hours if str(entry.id) == working_hours_id), None)
     if edit_working_hour is None:
-        return redirect(url_for('working_hours_page'))
+        edit_working_hour = WorkingHours.query.filter_by(id=working_hours_id, user_id=current_user.id).first_or_404()
 
     form = EditWorkingHoursForm()
     # if submitted form is valid, the data is updated
     if form.validate_on_submit():
+        # the record is read again with a lock, as the monthly summary is changed by the difference to its current hours
+        edit_working_hour = WorkingHours.lock(edit_working_hour.id, current_user.id)
+        if edit_working_hour is None:
+            return redirect(url_for('main.working_hours_page'))
+        MonthlySummary.record(current_user.id, edit_working_hour.date, hours=form.hours.data - edit_working_hour.working_hours)
         edit_working_hour.working_hours = form.hours.data
         edit_working_hour.comment = form.comment.data
         db.session.commit()
-        return redirect(url_for('working_hours_page'))
+        return redirect(url_for('main.working_hours_page'))
 
     # if the edit page is loaded, the already existing data is prefilled
     elif request.method == 'GET':
@@ -190,15 +251,10 @@ def edit_working_hours_page(working_hours_id):
         if edit_working_hour.comment is not None:
             form.comment.data = edit_working_hour.comment
 
-    # create a list of months to put the correct title
-    months = []
-    for month in range(1, 13):
-        months.append(datetime.date(2022, month, 1).strftime('%B'))
-
-    return render_template('working_hours/edit-working-hours.html', form=form, hours=hours, edit_working_hour=edit_working_hour, months=months, given_month=given_month, given_year=given_year)
+    return render_template('working_hours/edit-working-hours.html', form=form, hours=hours, edit_working_hour=edit_working_hour, months=month_names(), given_month=given_month, given_year=given_year)
 
 
-@app.route('/delete-working-hours/<working_hours_id>', methods=['GET', 'POST'])
+@bp.route('/delete-working-hours/<working_hours_id>', methods=['GET', 'POST'])
 @login_required
 def delete_working_hours_page(working_hours_id):
     """
@@ -212,42 +268,49 @@ def delete_working_hours_page(working_hours_id):
 
     # if there is no entry with given id for the user, the user is redirected to the overview page with records of working hours
     if working_hour is None:
-        return redirect(url_for('working_hours_page'))
+        return redirect(url_for('main.working_hours_page'))
 
     # if the user pressed on delete, the record is deleted and the user is redirected to the overview page
     if form.validate_on_submit():
+        # the record is read again with a lock, so that it is not deleted or changed concurrently
+        working_hour = WorkingHours.lock(working_hour.id, current_user.id)
+        if working_hour is None:
+            return redirect(url_for('main.working_hours_page'))
+        MonthlySummary.record(current_user.id, working_hour.date, days=-1, hours=-working_hour.working_hours)
         db.session.delete(working_hour)
         db.session.commit()
-        return redirect(url_for('working_hours_page'))
+        return redirect(url_for('main.working_hours_page'))
 
     return render_template('working_hours/delete-working-hours.html', form=form, working_hour=working_hour)
 
 
-@app.route('/user')
+@bp.route('/user')
 @login_required
 def user_page():
     """
     This page shows an overview of the users profile
     """
-    # the current logged in user is loaded from the database
-    user = User.query.filter_by(username=current_user.username).first_or_404()
-    # total worked days and hours are loaded from the database
-    total_hours = db.session.query(func.count(WorkingHours.date), func.sum(WorkingHours.working_hours)).filter_by(user_id=current_user.id).all()[0]
+    db.use_replica(current_user)
+    # the current logged in user is already loaded by Flask Login
+    user = current_user
+    # total worked days and hours are summed up from the monthly summaries
+    total_hours = db.session.query(func.sum(MonthlySummary.worked_days), func.sum(MonthlySummary.worked_hours)).filter_by(user_id=current_user.id).all()[0]
     (worked_days, worked_hours) = total_hours
     # this fallback will take care of new users without any records of worked hours
+    worked_days = worked_days or 0
     worked_hours = round(worked_hours or 0, 2)
     # calculation of flextime (if the user has worked more or less than the target_time)
     flextime = round(worked_hours - (worked_days * user.target_time), 2)
     return render_template('profile/user.html', user=user, flextime=flextime, worked_hours=worked_hours)
 
 
-@app.route('/edit-user', methods=['GET', 'POST'])
+@bp.route('/edit-user', methods=['GET', 'POST'])
 @login_required
 def edit_user_page():
     """
     On this page, the user can edit his profile
     """
-    user = User.query.filter_by(username=current_user.username).first_or_404()
+    user = current_user._get_current_object()
     form = EditUserForm()
 
     # if a valid form is submitted, the changes are saved to the database
@@ -260,7 +323,7 @@ def edit_user_page():
         db.session.commit()
         logout_user()
         login_user(user)
-        return redirect(url_for('user_page'))
+        return redirect(url_for('main.user_page'))
 
     # all input fields of the editing page are prefilled with the existing values
     elif request.method == 'GET':
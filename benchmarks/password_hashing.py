@@ -0,0 +1,48 @@
+"""
+Micro-benchmark of password hashing with the configured method.
+It reports the hashes per second of a single core and of a pool with one worker process per core.
+
+Usage: python benchmarks/password_hashing.py [--hashes 200] [--workers <cpu count>]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+import time
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import Config
+
+
+def measure(hashes, method, workers=None):
+    """
+    This method creates the given number of hashes and responses with the needed seconds.
+    Without workers, the hashes are created in the current process.
+    """
+    start = time.perf_counter()
+    if workers is None:
+        for _ in range(hashes):
+            generate_password_hash('benchmark-password', method)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(generate_password_hash, ['benchmark-password'] * hashes, [method] * hashes))
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of password hashing')
+    parser.add_argument('--hashes', type=int, default=200, help='number of hashes per measurement')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    args = parser.parse_args()
+
+    method = f'{Config.PASSWORD_HASH_ALGORITHM}:{Config.PASSWORD_HASH_ITERATIONS}'
+    print(f'method: {method}')
+
+    seconds = measure(args.hashes, method)
+    print(f'single core: {args.hashes / seconds:.1f} hashes/s ({seconds / args.hashes * 1000:.1f} ms per hash)')
+
+    seconds = measure(args.hashes, method, args.workers)
+    print(f'{args.workers} workers: {args.hashes / seconds:.1f} hashes/s '
+          f'({args.hashes / seconds / args.workers:.1f} hashes/s per core)')
@@ -0,0 +1,270 @@
+"""
+Benchmark of all pages & WebAPI endpoints with the Flask test client on a synthetic SQLite database.
+For every endpoint, the latency percentiles (p50, p95, p99), the throughput and the number of SQL queries per
+request are reported. If a baseline is given, the benchmark fails when an endpoint got slower or needs more queries.
+The seeded database is kept as <database>.seed. Every endpoint is measured with a new application on a fresh copy of it,
+so writing endpoints never change the data of the following ones and every run measures the same data.
+
+Usage:
+    python benchmarks/run.py [--users 1000] [--years 3] [--requests 50]
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json [--tolerance 0.25]
+"""
+
+import argparse
+import base64
+import datetime
+import gc
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from seed import PASSWORD, seed
+
+
+def percentile(values, percent):
+    """
+    This method responses with the value, below which the given percentage of the sorted values are
+    """
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+class QueryCounter(object):
+    """
+    This class counts all SQL statements executed by an engine
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, connection, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def copy_database(source, target):
+    """
+    This method replaces the target SQLite file with a copy of the source (the journals of the target are removed)
+    """
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target)
+    try:
+        source_connection.backup(target_connection)
+    finally:
+        source_connection.close()
+        target_connection.close()
+
+
+def dispose_engines(app, db):
+    """
+    This method closes all connections of the application, so that its database file can be replaced
+    """
+    with app.app_context():
+        db.session.remove()
+        for bind in [None] + list(app.config['SQLALCHEMY_BINDS']):
+            db.get_engine(app, bind=bind).dispose()
+
+
+def create_scenarios(app, db, username, requests):
+    """
+    This method creates the list of benchmarked endpoints as (name, method, URL factory, options).
+    The URL factory gets the number of the request, so that writing endpoints use new dates every time.
+    """
+    from app.models import User, WorkingHours
+
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        first = WorkingHours.query.filter_by(user_id=user.id).order_by(WorkingHours.date).first()
+        last = WorkingHours.query.filter_by(user_id=user.id).order_by(WorkingHours.date.desc()).first()
+        record_ids = [hours.id for hours in WorkingHours.query.filter_by(user_id=user.id)
+                      .order_by(WorkingHours.date.desc()).limit(requests + 1)]
+
+    # writing endpoints use dates after the generated history
+    def future_date(number):
+        return (last.date + datetime.timedelta(days=number + 1)).isoformat()
+
+    def batch(number):
+        start = last.date + datetime.timedelta(days=1000 + number * 31)
+        return [{'date': (start + datetime.timedelta(days=day)).isoformat(), 'working_hours': 8} for day in range(22)]
+
+    month = f'month={first.date.month}&year={first.date.year}'
+    return [
+        ('GET /login', 'GET', lambda n: '/login', {'web': False}),
+        ('GET /working-hours', 'GET', lambda n: '/working-hours', {'web': True}),
+        ('GET /working-hours (old month)', 'GET', lambda n: f'/working-hours?{month}', {'web': True}),
+        ('GET /edit-working-hours', 'GET', lambda n: f'/edit-working-hours/{record_ids[0]}', {'web': True}),
+        ('GET /delete-working-hours', 'GET', lambda n: f'/delete-working-hours/{record_ids[0]}', {'web': True}),
+        ('GET /user', 'GET', lambda n: '/user', {'web': True}),
+        ('GET /edit-user', 'GET', lambda n: '/edit-user', {'web': True}),
+        ('POST /api/tokens', 'POST', lambda n: '/api/tokens', {'basic': True}),
+        ('GET /api/users', 'GET', lambda n: '/api/users', {}),
+        ('GET /api/working-hours', 'GET', lambda n: '/api/working-hours', {}),
+        ('GET /api/working-hours?limit=1000', 'GET', lambda n: '/api/working-hours?limit=1000', {}),
+        ('GET /api/working-hours?fields=...', 'GET',
+         lambda n: '/api/working-hours?limit=1000&fields=date,working_hours', {}),
+        ('GET /api/working-hours (year)', 'GET',
+         lambda n: f'/api/working-hours?from={last.date.year}-01-01&to={last.date.year}-12-31&limit=1000', {}),
+        ('GET /api/working-hours/<id>', 'GET', lambda n: f'/api/working-hours/{record_ids[0]}', {}),
+        ('GET /api/working-hours/export', 'GET', lambda n: '/api/working-hours/export', {}),
+        ('GET /api/reports?group=week', 'GET', lambda n: '/api/reports?group=week', {}),
+        ('GET /api/reports?group=month', 'GET', lambda n: '/api/reports?group=month', {}),
+        ('GET /api/company/analytics', 'GET', lambda n: '/api/company/analytics', {}),
+        ('POST /api/working-hours', 'POST', lambda n: '/api/working-hours',
+         {'json': lambda n: {'date': future_date(n), 'working_hours': 8}}),
+        ('POST /api/working-hours/batch', 'POST', lambda n: '/api/working-hours/batch', {'json': batch}),
+        ('PUT /api/working-hours/<id>', 'PUT', lambda n: f'/api/working-hours/{record_ids[n]}',
+         {'json': lambda n: {'working_hours': 7.5, 'comment': f'benchmark {n}'}}),
+        ('DELETE /api/working-hours/<id>', 'DELETE', lambda n: f'/api/working-hours/{record_ids[n + 1]}', {}),
+    ]
+
+
+def measure(app, db, username, scenario, requests, warmup, counter):
+    """
+    This method sends the requests of the scenario with the given name to the application and measures them
+    """
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['ADMINS'] = [username]
+    basic = 'Basic ' + base64.b64encode(f'{username}:{PASSWORD}'.encode('utf-8')).decode('utf-8')
+
+    api = app.test_client()
+    token = api.post('/api/tokens', headers={'Authorization': basic}).get_json()['token']
+    web = app.test_client()
+    web.post('/login', data={'username': username, 'password': PASSWORD})
+
+    (name, method, url, options) = next(entry for entry in create_scenarios(app, db, username, warmup + requests)
+                                        if entry[0] == scenario)
+    client = web if options.get('web') is not None else api
+    headers = {}
+    if options.get('basic'):
+        headers['Authorization'] = basic
+    elif options.get('web') is None:
+        headers['Authorization'] = f'Bearer {token}'
+
+    # the garbage collector would add pauses to random requests, so it runs before the measurement only
+    latencies = []
+    queries = []
+    gc.collect()
+    gc.disable()
+    try:
+        for number in range(warmup + requests):
+            json_body = options['json'](number) if 'json' in options else None
+            counter.count = 0
+            start = time.perf_counter()
+            response = client.open(url(number), method=method, headers=headers, json=json_body)
+            response.get_data()
+            latency = time.perf_counter() - start
+            if response.status_code >= 400:
+                raise RuntimeError(f'{name} failed with status {response.status_code}')
+            if number >= warmup:
+                latencies.append(latency)
+                queries.append(counter.count)
+    finally:
+        gc.enable()
+
+    latencies.sort()
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'requests_per_second': round(len(latencies) / sum(latencies), 1),
+        'queries': max(queries)
+    }
+
+
+def run(create_app, db, database, username, requests, warmup):
+    """
+    This method measures every endpoint with a new application on a fresh copy of the seeded database
+    """
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    # the statements of all engines are counted (reads may use the replica)
+    counter = QueryCounter()
+    event.listen(Engine, 'before_cursor_execute', counter)
+
+    app = create_app()
+    names = [name for (name, method, url, options) in create_scenarios(app, db, username, warmup + requests)]
+    dispose_engines(app, db)
+
+    results = {}
+    for name in names:
+        copy_database(database + '.seed', database)
+        app = create_app()
+        try:
+            results[name] = measure(app, db, username, name, requests, warmup, counter)
+        finally:
+            dispose_engines(app, db)
+    return results
+
+
+def compare(results, baseline, tolerance, min_slowdown_ms):
+    """
+    This method compares the results with the baseline and responses with a list of regressions.
+    An endpoint only counts as slower if its p95 exceeds the tolerance and the minimal slowdown (timer noise).
+    """
+    regressions = []
+    for (name, result) in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['p95_ms'] > max(expected['p95_ms'] * (1 + tolerance), expected['p95_ms'] + min_slowdown_ms):
+            regressions.append(f'{name}: p95 {result["p95_ms"]}ms (baseline {expected["p95_ms"]}ms)')
+        if result['queries'] > expected['queries']:
+            regressions.append(f'{name}: {result["queries"]} queries (baseline {expected["queries"]})')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of all endpoints of TiMa')
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'tima-benchmark.db'))
+    parser.add_argument('--users', type=int, default=1000, help='number of generated users')
+    parser.add_argument('--years', type=int, default=3, help='years of generated working hours per user')
+    parser.add_argument('--reseed', action='store_true', help='generate the database even if it exists')
+    parser.add_argument('--requests', type=int, default=50, help='measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per endpoint')
+    parser.add_argument('--baseline', help='JSON file with results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown of p95 (0.25 = 25%%)')
+    parser.add_argument('--min-slowdown-ms', type=float, default=5,
+                        help='slowdown of p95 in milliseconds, below which no regression is reported')
+    parser.add_argument('--save-baseline', help='JSON file to store the results in')
+    args = parser.parse_args()
+
+    # the database has to be configured before the application is loaded
+    database = os.path.abspath(args.database)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database
+    from app import create_app, db
+
+    if args.reseed or not os.path.exists(database + '.seed'):
+        print(f'Seeding {args.users} users with {args.years} years of working hours...')
+        app = create_app()
+        seed(app, db, args.users, args.years)
+        dispose_engines(app, db)
+        copy_database(database, database + '.seed')
+
+    results = run(create_app, db, database, 'user1', args.requests, args.warmup)
+
+    print(f'{"endpoint":<40} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"req/s":>9} {"queries":>8}')
+    for (name, result) in results.items():
+        print(f'{name:<40} {result["p50_ms"]:>9} {result["p95_ms"]:>9} {result["p99_ms"]:>9} '
+              f'{result["requests_per_second"]:>9} {result["queries"]:>8}')
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance, args.min_slowdown_ms)
+        if regressions:
+            print('\nRegressions compared to the baseline:')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+        print('\nNo regressions compared to the baseline.')
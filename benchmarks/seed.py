@@ -0,0 +1,81 @@
+"""
+Generator of a synthetic population for benchmarks.
+Every user gets one record of working hours per weekday of the given number of years (until a fixed anchor date),
+so that every seeded database contains the same data, no matter on which day it is generated.
+
+Usage: python benchmarks/seed.py [--database /tmp/tima-benchmark.db] [--users 10000] [--years 3]
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# password of all generated users
+PASSWORD = 'benchmark'
+COMPANIES = 20
+# last day of the generated working hours
+ANCHOR_DATE = datetime.date(2024, 12, 31)
+
+
+def seed(app, db, users, years, random_seed=42, last_date=ANCHOR_DATE):
+    """
+    This method creates all tables and fills them with the synthetic population.
+    Rows are inserted in large batches without ORM objects, the monthly summaries are calculated afterwards.
+    """
+    from app.models import MonthlySummary, User, WorkingHours
+
+    generator = random.Random(random_seed)
+    first_date = last_date - datetime.timedelta(days=365 * years)
+    weekdays = [first_date + datetime.timedelta(days=day) for day in range((last_date - first_date).days + 1)]
+    weekdays = [date for date in weekdays if date.weekday() < 5]
+
+    with app.app_context():
+        # only the primary database is created (a SQLite replica is the same file opened read-only)
+        db.drop_all(bind=None)
+        db.create_all(bind=None)
+        # all users share one password hash, so that seeding does not take hours
+        user = User()
+        user.set_password(PASSWORD)
+        password_hash = user.password_hash
+
+        db.session.execute(User.__table__.insert(), [{
+            'id': user_id,
+            'username': f'user{user_id}',
+            'email': f'user{user_id}@tima.tk',
+            'password_hash': password_hash,
+            'company': f'Company {user_id % COMPANIES}',
+            'job': 'Benchmark',
+            'target_time': 8.0,
+            'data_version': 0,
+            'data_modified': datetime.datetime.combine(last_date, datetime.time())
+        } for user_id in range(1, users + 1)])
+
+        for user_id in range(1, users + 1):
+            db.session.execute(WorkingHours.__table__.insert(), [{
+                'user_id': user_id,
+                'date': date,
+                'working_hours': round(generator.gauss(8.2, 0.8), 2),
+                'comment': 'synthetic' if generator.random() < 0.1 else ''
+            } for date in weekdays])
+        MonthlySummary.rebuild()
+        db.session.commit()
+    return len(weekdays)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Seed a SQLite database with synthetic working hours')
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'tima-benchmark.db'))
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--years', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.database)
+    from app import create_app, db
+    app = create_app()
+    records = seed(app, db, args.users, args.years)
+    print(f'Seeded {args.users} users with {records} records each into {args.database}')
@@ -0,0 +1,85 @@
+"""
+Benchmark of the serialization of lists of working hours.
+The ORM path (objects, to_dict() & jsonify) is compared with the projection path of the WebAPI
+(tuples of the needed columns & the precompiled encoder), with all fields and with a sparse field set.
+
+Usage: python benchmarks/serialization.py [--years 40] [--repeat 20] [--min-speedup 2]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from seed import seed
+
+
+def measure(function, repeat):
+    """
+    This method calls the function repeatedly and responses with the best time in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def create_paths(app, db):
+    """
+    This method creates the compared serializations of all records of the first user as (name, function)
+    """
+    from app.models import WorkingHours
+    from app.serialization import parse_fields, serialize_rows
+    from flask import jsonify
+
+    def orm():
+        rows = WorkingHours.query.filter(WorkingHours.user_id == 1).order_by(WorkingHours.date, WorkingHours.id).all()
+        return jsonify([row.to_dict() for row in rows]).get_data()
+
+    def projection(fields):
+        def serialize():
+            columns = [getattr(WorkingHours, field) for field in fields]
+            rows = db.session.query(*columns).filter(WorkingHours.user_id == 1) \
+                .order_by(WorkingHours.date, WorkingHours.id).all()
+            return serialize_rows(rows, fields)
+        return serialize
+
+    return [
+        ('ORM objects & to_dict()', orm),
+        ('projection (all fields)', projection(parse_fields(None))),
+        ('projection (date,working_hours)', projection(parse_fields('date,working_hours')))
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of the serialization of working hours')
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'tima-serialization.db'))
+    parser.add_argument('--years', type=int, default=40, help='years of generated working hours (one user)')
+    parser.add_argument('--repeat', type=int, default=20, help='measurements per path (the best one is reported)')
+    parser.add_argument('--min-speedup', type=float, default=2.0,
+                        help='fail if the projection of all fields is not at least this much faster')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.database)
+    from app import create_app, db
+    app = create_app()
+    records = seed(app, db, 1, args.years)
+
+    results = {}
+    with app.test_request_context():
+        for (name, function) in create_paths(app, db):
+            function()
+            seconds = measure(function, args.repeat)
+            results[name] = seconds
+            print(f'{name:<35} {seconds * 1000:>9.2f} ms {records / seconds:>12,.0f} rows/s')
+
+    speedup = results['ORM objects & to_dict()'] / results['projection (all fields)']
+    print(f'\nspeedup of the projection (all fields): {speedup:.1f}x')
+    if speedup < args.min_speedup:
+        print(f'The projection is expected to be at least {args.min_speedup}x faster.')
+        sys.exit(1)
@@ -0,0 +1,142 @@
+"""
+Benchmark of concurrent readers & writers on SQLite.
+The throughput of readers alone, of writers alone and of both together is measured, once with the SQLite profile
+(WAL journal, pragmas, pooled & read-only connections) and once without it (SQLITE_WAL=false). So it shows whether
+writers slow down readers and whether readers slow down writers. Every writing request stores a batch of records in one
+transaction, which holds the write lock long enough to contend with the readers. Failed requests (e.g. "database is
+locked") are counted as errors. Readers & writers run in separate processes like gunicorn workers.
+
+Usage: python benchmarks/sqlite_concurrency.py [--readers 4] [--writers 2] [--batch 50] [--seconds 5]
+"""
+
+import argparse
+import base64
+import datetime
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from seed import PASSWORD, seed
+
+# modes of the benchmark as (name, value of SQLITE_WAL)
+MODES = [('SQLite profile (WAL)', 'true'), ('without profile', 'false')]
+
+
+def login(app, user_id):
+    """
+    This method responses with a test client and the authorization header of the given user
+    """
+    client = app.test_client()
+    basic = 'Basic ' + base64.b64encode(f'user{user_id}:{PASSWORD}'.encode('utf-8')).decode('utf-8')
+    token = client.post('/api/tokens', headers={'Authorization': basic}).get_json()['token']
+    return client, {'Authorization': f'Bearer {token}'}
+
+
+def work(kind, user_id, batch, seconds, barrier, results):
+    """
+    This method sends reading or writing requests of the given user until the time is over (in its own process,
+    like a worker of gunicorn) and puts the number of successful & failed requests into the results queue
+    """
+    from app import create_app
+    app = create_app()
+    # the password of the login is hashed in this process, so that no pool of hashing processes is started
+    app.config['PASSWORD_HASH_WORKERS'] = 0
+    (client, headers) = login(app, user_id)
+    # every writer adds records of its own user after the generated history
+    date = datetime.date.today() + datetime.timedelta(days=1000 * user_id)
+    (successes, errors) = (0, 0)
+
+    barrier.wait()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if kind == 'read':
+            ok = client.get('/api/working-hours?limit=100', headers=headers).status_code == 200
+        else:
+            entries = [{'date': (date + datetime.timedelta(days=day)).isoformat(), 'working_hours': 8}
+                       for day in range(batch)]
+            date += datetime.timedelta(days=batch)
+            response = client.post('/api/working-hours/batch', headers=headers, json=entries)
+            ok = response.status_code == 200 and all(result['status'] == 201 for result in response.get_json())
+        (successes, errors) = (successes + 1, errors) if ok else (successes, errors + 1)
+    results.put((kind, successes, errors))
+
+
+def measure(readers, writers, batch, seconds):
+    """
+    This method runs the readers & writers in separate processes for the given time.
+    It responses with the number of successful & failed reads and writes per second.
+    """
+    # the processes are spawned (not forked), so that they do not share any pool of the seeding process
+    context = multiprocessing.get_context('spawn')
+    kinds = ['read'] * readers + ['write'] * writers
+    barrier = context.Barrier(len(kinds))
+    results = context.Queue()
+    processes = [context.Process(target=work, args=(kind, number + 1, batch, seconds, barrier, results))
+                 for (number, kind) in enumerate(kinds)]
+    for process in processes:
+        process.start()
+    counts = {'reads': 0, 'read_errors': 0, 'writes': 0, 'write_errors': 0}
+    for _ in processes:
+        (kind, successes, errors) = results.get()
+        counts[f'{kind}s'] += successes
+        counts[f'{kind}_errors'] += errors
+    for process in processes:
+        process.join()
+    return {key: round(value / seconds, 1) for (key, value) in counts.items()}
+
+
+def run_mode(args):
+    """
+    This method measures the current mode (configured by the environment) and prints the results as JSON
+    """
+    database = os.path.abspath(args.database)
+    for path in (database, database + '-wal', database + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database
+    from app import create_app, db
+    app = create_app()
+    seed(app, db, args.readers + args.writers, args.years)
+
+    results = {
+        'readers': measure(args.readers, 0, args.batch, args.seconds),
+        'writers': measure(0, args.writers, args.batch, args.seconds),
+        'load': measure(args.readers, args.writers, args.batch, args.seconds)
+    }
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of concurrent readers & writers on SQLite')
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'tima-concurrency.db'))
+    parser.add_argument('--years', type=int, default=3, help='years of generated working hours per user')
+    parser.add_argument('--readers', type=int, default=4, help='processes sending reading requests')
+    parser.add_argument('--writers', type=int, default=2, help='processes sending writing requests')
+    parser.add_argument('--batch', type=int, default=50, help='records stored by every writing request')
+    parser.add_argument('--seconds', type=float, default=5, help='duration of every measurement')
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        sys.exit(0)
+
+    # every mode runs in its own process, as the configuration is read when the application is loaded
+    print(f'{"mode":<22} {"reads/s alone":>14} {"reads/s load":>13} {"writes/s alone":>15} {"writes/s load":>14} '
+          f'{"errors/s":>9}')
+    for (name, wal) in MODES:
+        output = subprocess.run([sys.executable, __file__, '--mode', wal, '--database', args.database,
+                                 '--years', str(args.years), '--readers', str(args.readers),
+                                 '--writers', str(args.writers), '--batch', str(args.batch),
+                                 '--seconds', str(args.seconds)],
+                                env=dict(os.environ, SQLITE_WAL=wal), check=True, capture_output=True, text=True)
+        results = json.loads(output.stdout.strip().splitlines()[-1])
+        (readers, writers, load) = (results['readers'], results['writers'], results['load'])
+        errors = load['read_errors'] + load['write_errors']
+        print(f'{name:<22} {readers["reads"]:>14} {load["reads"]:>13} {writers["writes"]:>15} {load["writes"]:>14} '
+              f'{errors:>9}')
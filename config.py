@@ -12,7 +12,150 @@ if secret_key_file:
     secret_key = open(secret_key_file).read()
 
 
+def web_workers():
+    """
+    The number of worker processes of the production web server (two per CPU and one more by default)
+    """
+    return int(os.environ.get('WEB_WORKERS') or (os.cpu_count() or 1) * 2 + 1)
+
+
+def web_threads():
+    """
+    The number of threads of every worker process of the production web server
+    """
+    return int(os.environ.get('WEB_THREADS') or 4)
+
+
+def engine_options(database_uri):
+    """
+    Options for the connection pool of the database engine.
+    SQLite opens a new connection for every session, so only pre-ping is used there.
+    Every web worker has its own pool (per database), so the pools of all workers together must not exceed
+    DATABASE_MAX_CONNECTIONS. A worker never needs more connections than threads.
+    """
+    options = {
+        'pool_pre_ping': os.environ.get('DATABASE_POOL_PRE_PING', 'true').lower() == 'true'
+    }
+    if database_uri.startswith('sqlite'):
+        return options
+
+    connections_per_worker = max(int(os.environ.get('DATABASE_MAX_CONNECTIONS') or 100) // web_workers(), 1)
+    options.update({
+        'pool_size': int(os.environ.get('DATABASE_POOL_SIZE') or min(web_threads(), connections_per_worker)),
+        'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW') or 0),
+        'pool_recycle': int(os.environ.get('DATABASE_POOL_RECYCLE') or 1800),
+        'pool_timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT') or 10)
+    })
+    if database_uri.startswith('mysql'):
+        options['connect_args'] = {
+            'connect_timeout': int(os.environ.get('DATABASE_CONNECT_TIMEOUT') or 10),
+            'read_timeout': int(os.environ.get('DATABASE_READ_TIMEOUT') or 30),
+            'write_timeout': int(os.environ.get('DATABASE_WRITE_TIMEOUT') or 30)
+        }
+    return options
+
+
+def replica_uri(database_uri):
+    """
+    The URL of the optional read replica. For a SQLite file with the WAL profile, the same file is opened read-only,
+    so that reading requests use their own connections and never wait for a writer.
+    """
+    if os.environ.get('DATABASE_REPLICA_URL'):
+        return os.environ['DATABASE_REPLICA_URL']
+    if database_uri.startswith('sqlite:///') and database_uri != 'sqlite:///:memory:' and '?' not in database_uri \
+            and os.environ.get('SQLITE_WAL', 'true').lower() == 'true':
+        return database_uri + '?mode=ro'
+    return None
+
+
 class Config(object):
     SECRET_KEY = secret_key or 'ein-geheim-code-den-niemand-kennt'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # seconds to wait for the database on startup (flask prepare-database)
+    DATABASE_STARTUP_TIMEOUT = float(os.environ.get('DATABASE_STARTUP_TIMEOUT') or 60)
+
+    # optional read replica of the database. Read-only pages use the replica, unless the user has changed data within
+    # the last REPLICA_STICKY_SECONDS (the time of the last change is stored with the user, see use_replica()).
+    SQLALCHEMY_BINDS = {'replica': replica_uri(SQLALCHEMY_DATABASE_URI)} if replica_uri(SQLALCHEMY_DATABASE_URI) else {}
+
+    # SQLite profile for single-node deployments: WAL journal, pooled connections with these pragmas
+    # (busy timeout in milliseconds, page cache in KiB, memory mapped I/O in bytes) and a read-only connection pool
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', 'true').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or 16384)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE') or 10)
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS') or 10)
+
+    # pagination of list responses in the WebAPI
+    API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE') or 100)
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE') or 1000)
+    API_MAX_BATCH_SIZE = int(os.environ.get('API_MAX_BATCH_SIZE') or 1000)
+
+    # folder of the files of archived years (flask archive-year)
+    ARCHIVE_FOLDER = os.environ.get('ARCHIVE_FOLDER') or os.path.join(basedir, 'archive')
+
+    # number of rows fetched at once for streamed exports
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 1000)
+
+    # usernames (comma separated) of administrators, who may see company wide analytics
+    ADMINS = [username.strip() for username in (os.environ.get('ADMINS') or '').split(',') if username.strip()]
+
+    # seconds until cached company analytics are calculated again
+    ANALYTICS_CACHE_TIMEOUT = int(os.environ.get('ANALYTICS_CACHE_TIMEOUT') or 300)
+
+    # cache of verified tokens of the WebAPI (maximal number of tokens and seconds until a token is verified again).
+    # The cache belongs to one worker process: a revoked token is still accepted by other workers for up to
+    # TOKEN_CACHE_TIMEOUT seconds (expired tokens are always rejected)
+    TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE') or 10000)
+    TOKEN_CACHE_TIMEOUT = int(os.environ.get('TOKEN_CACHE_TIMEOUT') or 3)
+
+    # cache of users loaded for the web pages (maximal number of users and seconds until a user is loaded again).
+    # Like the token cache, other workers may show a changed profile for up to USER_CACHE_TIMEOUT seconds
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 10000)
+    USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT') or 3)
+
+    # cache of rendered parts of pages, e.g. the table of a month (maximal number of entries and seconds to keep them)
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE') or 10000)
+    FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT') or 600)
+
+    # compiled templates are stored in this folder and shared by all worker processes. It is created only accessible
+    # by the user of the application, which has to own it (it must not be writable by other users like /tmp).
+    TEMPLATE_CACHE_FOLDER = os.environ.get('TEMPLATE_CACHE_FOLDER') or os.path.join(basedir, 'template-cache')
+
+    # hashing of passwords (method of werkzeug & number of worker processes, 0 hashes in the request thread).
+    # Every web worker (see WEB_WORKERS) has its own pool, so there are already about two web workers per CPU.
+    PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM') or 'pbkdf2:sha256'
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS') or 260000)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 1)
+
+    # production web server (gunicorn), see gunicorn.conf.py
+    WEB_BIND = os.environ.get('WEB_BIND') or '0.0.0.0:5000'
+    WEB_WORKERS = web_workers()
+    WEB_THREADS = web_threads()
+    WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT') or 30)
+    WEB_GRACEFUL_TIMEOUT = int(os.environ.get('WEB_GRACEFUL_TIMEOUT') or 30)
+    WEB_KEEPALIVE = int(os.environ.get('WEB_KEEPALIVE') or 5)
+    WEB_MAX_REQUESTS = int(os.environ.get('WEB_MAX_REQUESTS') or 1000)
+    WEB_MAX_REQUESTS_JITTER = int(os.environ.get('WEB_MAX_REQUESTS_JITTER') or 100)
+
+    # logging to stderr as JSON lines (every request is logged with its latency, unless LOG_REQUESTS=false)
+    LOG_REQUESTS = os.environ.get('LOG_REQUESTS', 'true').lower() == 'true'
+    # share of 404 errors, which are logged (e.g. 0.1 logs every tenth)
+    LOG_NOT_FOUND_SAMPLE_RATE = float(os.environ.get('LOG_NOT_FOUND_SAMPLE_RATE') or 1.0)
+
+    # profiling of single requests by administrators (header "X-Profile: 1" or "?_profile=1") into the profiles folder
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILES_FOLDER = os.environ.get('PROFILES_FOLDER') or os.path.join(basedir, 'profiles')
+
+    # warn about equal queries executed repeatedly within one request (always active in debug mode)
+    DETECT_REPEATED_QUERIES = os.environ.get('DETECT_REPEATED_QUERIES', 'false').lower() == 'true'
+    REPEATED_QUERY_THRESHOLD = int(os.environ.get('REPEATED_QUERY_THRESHOLD') or 2)
+
+    # compression of responses (minimal size in bytes, level of gzip 1-9 & quality of brotli 0-11)
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 500)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY') or 4)
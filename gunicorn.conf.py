@@ -0,0 +1,66 @@
+"""
+Configuration of gunicorn to serve the application in production with multiple worker processes.
+Start with: gunicorn --config gunicorn.conf.py tima:app
+SIGHUP reloads this configuration and replaces the workers gracefully. As the application is preloaded by the master
+process, new workers still run the loaded code: after a deployment, the master has to be restarted.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+# the configuration file is loaded before gunicorn adds the application folder to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import Config
+
+# the workers share their metrics through files in this folder
+# (the variable must be set before the application and prometheus_client are loaded)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'tima-metrics'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+timeout = Config.WEB_TIMEOUT
+graceful_timeout = Config.WEB_GRACEFUL_TIMEOUT
+keepalive = Config.WEB_KEEPALIVE
+
+# workers are replaced after a number of requests (with jitter, so that not all workers restart at once)
+max_requests = Config.WEB_MAX_REQUESTS
+max_requests_jitter = Config.WEB_MAX_REQUESTS_JITTER
+
+# the application is loaded once in the master process and shared copy-on-write with all workers
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """
+    The metrics of a previous run are removed once, when the master process starts (and not on every reload of
+    this configuration, which would remove the metrics of running workers)
+    """
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def post_fork(server, worker):
+    """
+    Database connections must not be shared between processes.
+    Every worker forgets the connections of all databases (primary & replica), which may have been opened by the
+    master process.
+    """
+    from app import db
+    from tima import app
+    with app.app_context():
+        for bind in [None] + list(app.config['SQLALCHEMY_BINDS']):
+            db.get_engine(app, bind=bind).dispose(close=False)
+
+
+def child_exit(server, worker):
+    """
+    The metrics of a stopped worker are kept, but its live values (gauges) are removed
+    """
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
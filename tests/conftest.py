@@ -0,0 +1,124 @@
+"""
+Fixtures of the tests: every test gets its own application with a migrated SQLite database in a temporary folder.
+The migrations are applied once by the flask command (like on startup of the container) and the file is copied.
+"""
+
+from app import create_app, db
+from app.models import User
+import base64
+from config import Config
+import os
+import pytest
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'secret-12345'
+
+
+def migrate_database(path, revision='head'):
+    """
+    This method applies the migrations up to the given revision to the SQLite file in a separate process
+    """
+    env = dict(os.environ, FLASK_APP='tima.py', DATABASE_URL=f'sqlite:///{path}',
+               TEMPLATE_CACHE_FOLDER=os.path.join(os.path.dirname(path), 'template-cache'))
+    subprocess.run([sys.executable, '-m', 'flask', 'db', 'upgrade', revision], cwd=ROOT, env=env, check=True,
+                   capture_output=True)
+
+
+def make_config(folder, **settings):
+    """
+    This method creates the configuration of a test application with its files in the given folder
+    """
+    database = os.path.join(folder, 'tima.db')
+
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{database}'
+        SQLALCHEMY_BINDS = {'replica': f'sqlite:///{database}?mode=ro'}
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        WTF_CSRF_ENABLED = False
+        PASSWORD_HASH_WORKERS = 0
+        PASSWORD_HASH_ITERATIONS = 1000
+        ARCHIVE_FOLDER = os.path.join(folder, 'archive')
+        PROFILES_FOLDER = os.path.join(folder, 'profiles')
+        TEMPLATE_CACHE_FOLDER = os.path.join(folder, 'template-cache')
+
+    for (key, value) in settings.items():
+        setattr(TestConfig, key, value)
+    return TestConfig
+
+
+@pytest.fixture(scope='session')
+def migrated_database(tmp_path_factory):
+    path = tmp_path_factory.mktemp('template') / 'tima.db'
+    migrate_database(path)
+    return path
+
+
+@pytest.fixture
+def make_app(tmp_path, migrated_database):
+    """
+    This fixture creates applications with the given settings, which share the database of the test
+    """
+    if not (tmp_path / 'tima.db').exists():
+        shutil.copy(migrated_database, tmp_path / 'tima.db')
+    apps = []
+
+    def make(**settings):
+        apps.append(create_app(make_config(tmp_path, **settings)))
+        return apps[-1]
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for bind in [None] + list(app.config['SQLALCHEMY_BINDS']):
+                db.get_engine(app, bind=bind).dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def create_user(username='tima', target_time=8.0, company='TiMapira'):
+    """
+    This method stores a new user with the password of the tests
+    """
+    user = User(username=username, email=f'{username}@tima.tk', company=company, job='WebDev',
+                target_time=target_time)
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def basic_auth(username):
+    return {'Authorization': 'Basic ' + base64.b64encode(f'{username}:{PASSWORD}'.encode('utf-8')).decode('utf-8')}
+
+
+def token_headers(client, username):
+    """
+    This method responses with the authorization header of a new token of the user
+    """
+    token = client.post('/api/tokens', headers=basic_auth(username)).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def user(app):
+    return create_user()
+
+
+@pytest.fixture
+def headers(client, user):
+    return token_headers(client, user.username)
@@ -0,0 +1,103 @@
+"""
+Tests of reading archived years through the WebAPI (records, reports & analytics)
+"""
+
+from app.archive import archive_year
+import pytest
+
+from conftest import create_user, PASSWORD, token_headers
+
+ENTRIES = [('2022-12-29', 8.0), ('2022-12-30', 7.5), ('2023-01-01', 2.0), ('2023-01-02', 9.0)]
+
+
+@pytest.fixture
+def archived(make_app):
+    app = make_app(ADMINS=['tima'])
+    with app.app_context():
+        create_user()
+        client = app.test_client()
+        headers = token_headers(client, 'tima')
+        for (date, hours) in ENTRIES:
+            client.post('/api/working-hours', headers=headers, json={'date': date, 'working_hours': hours})
+        assert archive_year(2022) == 2
+        yield client, headers
+
+
+def test_archived_records_are_listed(archived):
+    (client, headers) = archived
+
+    response = client.get('/api/working-hours?fields=date,working_hours', headers=headers)
+
+    assert [(entry['date'], entry['working_hours']) for entry in response.get_json()] == \
+           [('29.12.2022', 8.0), ('30.12.2022', 7.5), ('01.01.2023', 2.0), ('02.01.2023', 9.0)]
+
+
+def test_pages_continue_from_archive_into_database(archived):
+    (client, headers) = archived
+
+    dates = []
+    url = '/api/working-hours?limit=1&from=2022-12-30'
+    while url:
+        response = client.get(url, headers=headers)
+        dates += [entry['date'] for entry in response.get_json()]
+        link = response.headers.get('Link')
+        url = link[link.index('/api/'):link.index('>')] if link else None
+
+    assert dates == ['30.12.2022', '01.01.2023', '02.01.2023']
+
+
+def test_reports_sum_archived_periods(archived):
+    (client, headers) = archived
+
+    weeks = client.get('/api/reports?group=week', headers=headers).get_json()['periods']
+    years = client.get('/api/reports?group=year&to=2022-12-29', headers=headers).get_json()['periods']
+
+    # the week of 26.12.2022 contains archived records and a record of the database
+    assert [(period['period'], period['worked_days'], period['worked_hours']) for period in weeks] == \
+           [('2022-12-26', 3, 17.5), ('2023-01-02', 1, 9.0)]
+    assert [(period['period'], period['worked_hours']) for period in years] == [('2022', 8.0)]
+
+
+def test_analytics_include_archived_years(archived):
+    (client, headers) = archived
+
+    analytics = client.get('/api/company/analytics', headers=headers).get_json()
+
+    assert (analytics['worked_days'], analytics['worked_hours']) == (4, 26.5)
+
+
+def test_archived_date_can_not_be_recorded(archived):
+    (client, headers) = archived
+    client.post('/login', data={'username': 'tima', 'password': PASSWORD})
+
+    response = client.post('/working-hours', data={'date': '2022-12-28', 'hours': 8})
+
+    assert b'The year of this date is archived' in response.data
+    assert b'There is already an entry for this date.' not in response.data
+
+
+def test_change_feed_includes_archived_records(archived):
+    (client, headers) = archived
+
+    changes = client.get('/api/working-hours/changes?since=0', headers=headers).get_json()
+
+    assert [change['date'] for change in changes['changes']] == ['29.12.2022', '30.12.2022', '01.01.2023', '02.01.2023']
+    assert changes['deleted'] == []
+
+
+def test_archiving_is_no_change_for_synced_clients(make_app):
+    app = make_app()
+    with app.app_context():
+        create_user()
+        client = app.test_client()
+        headers = token_headers(client, 'tima')
+        client.post('/api/working-hours', headers=headers, json={'date': '2022-12-29', 'working_hours': 8})
+        synced = client.get('/api/working-hours/changes?since=0', headers=headers).get_json()
+        client.post('/api/working-hours', headers=headers, json={'date': '2022-12-30', 'working_hours': 7.5})
+        archive_year(2022)
+
+        changes = client.get(f'/api/working-hours/changes?since={synced["cursor"]}', headers=headers).get_json()
+
+    # the record changed after the last sync is sent from the archive, the other one is neither sent nor deleted
+    assert [change['date'] for change in changes['changes']] == ['30.12.2022']
+    assert changes['deleted'] == []
@@ -0,0 +1,68 @@
+"""
+Tests of POST /api/working-hours/batch
+"""
+
+from app import db
+import datetime
+from sqlalchemy import event
+
+
+def count_statements(app, prefix):
+    """
+    This method counts the executed statements of the primary database, which start with the given prefix
+    """
+    statements = []
+    event.listen(db.get_engine(app), 'before_cursor_execute',
+                 lambda connection, cursor, statement, *args: statements.append(statement))
+    return lambda: len([statement for statement in statements if statement.startswith(prefix)])
+
+
+def test_creates_and_updates_with_bulk_statements(app, client, headers):
+    client.post('/api/working-hours', headers=headers, json={'date': '2024-03-01', 'working_hours': 5})
+    client.post('/api/working-hours', headers=headers, json={'date': '2024-03-04', 'working_hours': 6})
+    entries = [{'date': (datetime.date(2024, 3, 1) + datetime.timedelta(days=day)).isoformat(), 'working_hours': 8}
+               for day in range(22)]
+    inserts = count_statements(app, 'INSERT INTO working_hours ')
+    updates = count_statements(app, 'UPDATE working_hours ')
+
+    response = client.post('/api/working-hours/batch', headers=headers, json=entries)
+
+    results = response.get_json()
+    assert response.status_code == 200
+    assert [result['status'] for result in results] == [200, 201, 201, 200] + [201] * 18
+    assert (inserts(), updates()) == (1, 1)
+    stored = client.get('/api/working-hours?limit=1000', headers=headers).get_json()
+    assert [hours['id'] for hours in stored] == [result['data']['id'] for result in results]
+    assert all(hours['working_hours'] == 8 for hours in stored)
+
+    report = client.get('/api/reports?group=month', headers=headers).get_json()['periods']
+    assert report == [{'period': '2024-03', 'worked_days': 22, 'worked_hours': 176.0, 'target_hours': 176.0,
+                       'flextime': 0.0}]
+
+
+def test_invalid_entries_are_rejected_one_by_one(client, headers):
+    response = client.post('/api/working-hours/batch', headers=headers, json=[
+        {'date': '2024-03-01', 'working_hours': 8},
+        {'date': '2024-03-01', 'working_hours': 7},
+        {'date': '2024-03-02', 'working_hours': 25},
+        {'date': '2024-03-03', 'working_hours': 'NaN'},
+        {'date': '2024-03-04', 'working_hours': 8, 'comment': 'x' * 65},
+        {'date': '2024-03-05', 'working_hours': 8, 'comment': ['not', 'a', 'text']},
+        {'working_hours': 8}
+    ])
+
+    assert response.status_code == 200
+    assert [result['status'] for result in response.get_json()] == [201, 400, 400, 400, 400, 400, 400]
+    assert len(client.get('/api/working-hours', headers=headers).get_json()) == 1
+
+
+def test_change_feed_contains_batch(client, headers):
+    client.post('/api/working-hours/batch', headers=headers, json=[{'date': '2024-03-01', 'working_hours': 8}])
+    cursor = client.get('/api/working-hours/changes', headers=headers).get_json()['cursor']
+
+    client.post('/api/working-hours/batch', headers=headers, json=[{'date': '2024-03-01', 'working_hours': 7},
+                                                                   {'date': '2024-03-02', 'working_hours': 6}])
+    changes = client.get(f'/api/working-hours/changes?since={cursor}', headers=headers).get_json()
+
+    assert [hours['working_hours'] for hours in changes['changes']] == [7, 6]
+    assert changes['cursor'] == cursor + 1
@@ -0,0 +1,48 @@
+"""
+Tests of the change feed of working hours
+"""
+
+from app import db
+import sqlite3
+
+from conftest import create_user, migrate_database, token_headers
+
+
+def test_changes_are_sent_since_cursor(client, headers):
+    client.post('/api/working-hours', headers=headers, json={'date': '2024-03-01', 'working_hours': 8})
+    first = client.get('/api/working-hours/changes', headers=headers).get_json()
+    assert [change['date'] for change in first['changes']] == ['01.03.2024']
+
+    created = client.post('/api/working-hours', headers=headers, json={'date': '2024-03-04', 'working_hours': 6})
+    client.delete(f'/api/working-hours/{first["changes"][0]["id"]}', headers=headers)
+    second = client.get(f'/api/working-hours/changes?since={first["cursor"]}', headers=headers).get_json()
+
+    assert [change['id'] for change in second['changes']] == [created.get_json()['id']]
+    assert second['deleted'] == [first['changes'][0]['id']]
+    assert second['cursor'] > first['cursor']
+
+
+def test_invalid_cursor(client, headers):
+    assert client.get('/api/working-hours/changes?since=1', headers=headers).status_code == 400
+    assert client.get('/api/working-hours/changes?since=x', headers=headers).status_code == 400
+
+
+def test_records_of_older_versions_are_sent_since_zero(make_app, tmp_path):
+    # the records are stored before the migration of the change feed
+    database = tmp_path / 'tima.db'
+    database.unlink()
+    migrate_database(database, '62f150c3fc4f')
+    app = make_app()
+    with app.app_context():
+        user_id = create_user().id
+        db.engine.dispose()
+    with sqlite3.connect(database) as connection:
+        connection.executemany('INSERT INTO working_hours (date, working_hours, user_id) VALUES (?, ?, ?)',
+                               [('2024-03-01', 8.0, user_id), ('2024-03-04', 6.5, user_id)])
+    migrate_database(database)
+
+    client = app.test_client()
+    changes = client.get('/api/working-hours/changes?since=0', headers=token_headers(client, 'tima')).get_json()
+
+    assert [(change['date'], change['working_hours']) for change in changes['changes']] == \
+           [('01.03.2024', 8.0), ('04.03.2024', 6.5)]
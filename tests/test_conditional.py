@@ -0,0 +1,48 @@
+"""
+Tests of the conditional GET requests (ETag) of the WebAPI
+"""
+
+from conftest import create_user, token_headers
+from test_replica import copy_database
+
+
+def test_not_modified_until_data_changes(client, headers):
+    response = client.get('/api/working-hours', headers=headers)
+    etag = response.headers['ETag']
+
+    cached = client.get('/api/working-hours', headers=dict(headers, **{'If-None-Match': etag}))
+    assert (cached.status_code, cached.data) == (304, b'')
+
+    client.post('/api/working-hours', headers=headers, json={'date': '2024-03-01', 'working_hours': 8})
+    changed = client.get('/api/working-hours', headers=dict(headers, **{'If-None-Match': etag}))
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert len(changed.get_json()) == 1
+
+
+def test_changes_within_a_second_are_not_missed(client, headers):
+    response = client.get('/api/users', headers=headers)
+
+    client.put('/api/users', headers=headers, json={'job': 'Tester'})
+    changed = client.get('/api/users', headers=dict(headers, **{'If-Modified-Since': response.headers['Last-Modified']}))
+
+    assert changed.status_code == 200
+    assert changed.get_json()['job'] == 'Tester'
+
+
+def test_etag_matches_data_of_lagging_replica(make_app, tmp_path):
+    app = make_app(SQLALCHEMY_BINDS={'replica': f'sqlite:///{tmp_path / "replica.db"}?mode=ro'},
+                   REPLICA_STICKY_SECONDS=0)
+    with app.app_context():
+        create_user()
+    client = app.test_client()
+    headers = token_headers(client, 'tima')
+    copy_database(tmp_path / 'tima.db', tmp_path / 'replica.db')
+    etag = client.get('/api/users', headers=headers).headers['ETag']
+
+    client.put('/api/users', headers=headers, json={'job': 'Tester'})
+    response = client.get('/api/users', headers=headers)
+
+    # the replica has not received the change yet, so its data is sent with its own (old) ETag
+    assert response.get_json()['job'] == 'WebDev'
+    assert response.headers['ETag'] == etag
@@ -0,0 +1,40 @@
+"""
+Tests of the hooks of the gunicorn configuration
+"""
+
+from app import db
+import os
+import pytest
+import runpy
+import sys
+import types
+
+from conftest import ROOT
+
+
+@pytest.fixture
+def gunicorn_config(tmp_path, monkeypatch):
+    metrics_folder = tmp_path / 'metrics'
+    metrics_folder.mkdir()
+    (metrics_folder / 'counter_1.db').write_bytes(b'')
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(metrics_folder))
+    return runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+
+
+def test_metrics_are_only_removed_on_starting(gunicorn_config):
+    folder = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    assert os.listdir(folder) == ['counter_1.db']
+
+    gunicorn_config['on_starting'](None)
+
+    assert os.listdir(folder) == []
+
+
+def test_post_fork_disposes_all_engines(app, gunicorn_config, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'tima', types.SimpleNamespace(app=app))
+    engines = [db.get_engine(app, bind=bind) for bind in (None, 'replica')]
+    pools = [engine.pool for engine in engines]
+
+    gunicorn_config['post_fork'](None, None)
+
+    assert all(engine.pool is not pool for (engine, pool) in zip(engines, pools))
@@ -0,0 +1,30 @@
+"""
+Tests of the health checks (liveness & readiness)
+"""
+
+
+def test_ready_in_other_working_directory(client, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    response = client.get('/readyz')
+
+    assert (response.status_code, response.get_json()) == (200, {'status': 'ok'})
+
+
+def test_not_ready_without_migrations(make_app, tmp_path):
+    app = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "empty.db"}')
+
+    response = app.test_client().get('/readyz')
+
+    assert response.status_code == 503
+    assert response.get_json()['error'] == 'Database migrations are not applied.'
+
+
+def test_not_ready_with_unreadable_migrations(app, tmp_path, monkeypatch):
+    # an installation without the folder of the migrations
+    monkeypatch.setattr(app, 'root_path', str(tmp_path / 'app'))
+
+    response = app.test_client().get('/readyz')
+
+    assert response.status_code == 503
+    assert response.get_json()['error'] == 'Database migrations are not readable.'
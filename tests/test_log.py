@@ -0,0 +1,27 @@
+"""
+Tests of logging the requests with the user of the request
+"""
+
+import base64
+import pytest
+
+from conftest import basic_auth
+
+
+def wrong_password(username):
+    return {'Authorization': 'Basic ' + base64.b64encode(f'{username}:wrong-password'.encode()).decode()}
+
+
+@pytest.mark.parametrize('username', ['tima', 'unknown'])
+def test_wrong_credentials_are_unauthorized(client, user, username, caplog):
+    response = client.post('/api/tokens', headers=wrong_password(username))
+
+    assert response.status_code == 401
+    assert [record.user_id for record in caplog.records if hasattr(record, 'status')] == [None]
+
+
+def test_requests_are_logged_with_user(client, user, caplog):
+    assert client.post('/api/tokens', headers=basic_auth('tima')).status_code == 200
+
+    record = next(record for record in caplog.records if hasattr(record, 'status'))
+    assert (record.user_id, record.route, record.status) == (user.id, '/api/tokens', 200)
@@ -0,0 +1,19 @@
+"""
+Tests of the metrics & statistics of requests, which share the timers of requests and statements
+"""
+
+from app import database
+from app.metrics import REQUEST_QUERIES
+
+
+def test_statements_are_timed_once_for_all_listeners(client, headers, monkeypatch):
+    statements = []
+    monkeypatch.setattr(database, 'statement_listeners',
+                        database.statement_listeners + [lambda *statement: statements.append(statement)])
+    observed = REQUEST_QUERIES.labels('api.get_working_hours')._sum.get()
+
+    client.get('/api/working-hours', headers=headers)
+
+    assert statements and all(duration >= 0 for (statement, parameters, duration) in statements)
+    # the metrics got the same statements
+    assert REQUEST_QUERIES.labels('api.get_working_hours')._sum.get() - observed == len(statements)
@@ -0,0 +1,28 @@
+"""
+Tests of the models (versions of the data of users & notification of change listeners)
+"""
+
+from app import db, models
+from app.models import User, WorkingHours
+import datetime
+
+
+def test_duplicate_date_keeps_data_version(app, user):
+    assert WorkingHours.create(datetime.date(2024, 3, 1), 8, None, user.id) is not None
+    db.session.commit()
+
+    assert WorkingHours.create(datetime.date(2024, 3, 1), 4, None, user.id) is None
+    db.session.commit()
+
+    assert db.session.query(User.data_version).filter(User.id == user.id).scalar() == 1
+
+
+def test_listeners_are_notified_after_commit(app, user, monkeypatch):
+    notified = []
+    monkeypatch.setattr(models, 'change_listeners', [notified.append])
+
+    WorkingHours.create(datetime.date(2024, 3, 1), 8, None, user.id)
+    assert notified == []
+    db.session.commit()
+
+    assert notified == [{user.id}]
@@ -0,0 +1,21 @@
+"""
+Tests of the month view of the web pages (with its cache of rendered tables)
+"""
+
+from conftest import create_user, PASSWORD
+
+
+def test_duplicate_date_does_not_cache_stale_table(make_app):
+    # every request of the web pages runs in its own application context (and loads the user from its cache)
+    app = make_app()
+    with app.app_context():
+        create_user()
+    client = app.test_client()
+    client.post('/login', data={'username': 'tima', 'password': PASSWORD})
+    client.post('/working-hours', data={'date': '2024-03-01', 'hours': 8})
+
+    duplicate = client.post('/working-hours?year=2024&month=3', data={'date': '2024-03-01', 'hours': 4})
+    assert b'There is already an entry for this date.' in duplicate.data
+    client.post('/working-hours', data={'date': '2024-03-04', 'hours': 6, 'comment': 'second entry'})
+
+    assert b'second entry' in client.get('/working-hours?year=2024&month=3').data
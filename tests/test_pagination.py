@@ -0,0 +1,44 @@
+"""
+Tests of the keyset pagination and the date filters of GET /api/working-hours
+"""
+
+import datetime
+
+
+def add_days(client, headers, first_day, days):
+    for day in range(days):
+        date = first_day + datetime.timedelta(days=day)
+        response = client.post('/api/working-hours', headers=headers,
+                               json={'date': date.isoformat(), 'working_hours': 8, 'comment': f'day {day}'})
+        assert response.status_code == 201
+
+
+def test_pages_follow_link_header(client, headers):
+    add_days(client, headers, datetime.date(2024, 3, 1), 5)
+
+    dates = []
+    url = '/api/working-hours?limit=2'
+    while url:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        dates += [hours['date'] for hours in response.get_json()]
+        link = response.headers.get('Link')
+        url = link[link.index('/api/'):link.index('>')] if link else None
+
+    assert dates == ['01.03.2024', '02.03.2024', '03.03.2024', '04.03.2024', '05.03.2024']
+
+
+def test_date_filters_and_fields(client, headers):
+    add_days(client, headers, datetime.date(2024, 3, 1), 5)
+
+    response = client.get('/api/working-hours?from=2024-03-02&to=2024-03-03&fields=date,comment', headers=headers)
+
+    assert response.get_json() == [{'comment': 'day 1', 'date': '02.03.2024'},
+                                   {'comment': 'day 2', 'date': '03.03.2024'}]
+    assert 'Link' not in response.headers
+
+
+def test_invalid_parameters(client, headers):
+    assert client.get('/api/working-hours?from=2024-13-01', headers=headers).status_code == 400
+    assert client.get('/api/working-hours?after=yesterday', headers=headers).status_code == 400
+    assert client.get('/api/working-hours?fields=password', headers=headers).status_code == 400
@@ -0,0 +1,36 @@
+"""
+Tests of hashing passwords in the pool of worker processes
+"""
+
+from app import passwords
+import pytest
+
+
+@pytest.fixture
+def pool_app(make_app, monkeypatch):
+    monkeypatch.setattr(passwords, 'executor', None)
+    app = make_app(PASSWORD_HASH_WORKERS=1)
+    with app.app_context():
+        yield app
+    if passwords.executor is not None:
+        passwords.executor.shutdown()
+
+
+def test_hashes_in_pool(pool_app):
+    password_hash = passwords.hash_password('secret')
+
+    assert passwords.executor is not None
+    assert passwords.verify_password(password_hash, 'secret')
+    assert not passwords.verify_password(password_hash, 'wrong')
+
+
+def test_broken_pool_is_replaced(pool_app):
+    password_hash = passwords.hash_password('secret')
+    broken = passwords.executor
+    for process in list(broken._processes.values()):
+        process.kill()
+        process.join()
+
+    assert passwords.verify_password(password_hash, 'secret')
+    assert passwords.executor is not broken
+    assert passwords.verify_password(password_hash, 'secret')
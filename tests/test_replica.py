@@ -0,0 +1,47 @@
+"""
+Tests of reading from the replica (read-your-writes across worker processes) and of the sizes of the pools
+"""
+
+import config
+import sqlite3
+
+from conftest import create_user, token_headers
+
+
+def copy_database(source, target):
+    """
+    This method copies the committed state of the SQLite database (like a replica, which lags behind)
+    """
+    with sqlite3.connect(source) as primary, sqlite3.connect(target) as replica:
+        primary.backup(replica)
+
+
+def test_writes_are_read_by_other_workers(make_app, tmp_path):
+    replica = {'replica': f'sqlite:///{tmp_path / "replica.db"}?mode=ro'}
+    worker = make_app(SQLALCHEMY_BINDS=replica)
+    other_worker = make_app(SQLALCHEMY_BINDS=replica)
+    lagging_worker = make_app(SQLALCHEMY_BINDS=replica, REPLICA_STICKY_SECONDS=0)
+    with worker.app_context():
+        create_user()
+    client = worker.test_client()
+    headers = token_headers(client, 'tima')
+    copy_database(tmp_path / 'tima.db', tmp_path / 'replica.db')
+
+    assert client.post('/api/working-hours', headers=headers,
+                       json={'date': '2024-03-01', 'working_hours': 8}).status_code == 201
+
+    # the next request of the user is handled by another worker, which reads from the primary database
+    assert len(other_worker.test_client().get('/api/working-hours', headers=headers).get_json()) == 1
+    # after REPLICA_STICKY_SECONDS, the lagging replica is read
+    assert lagging_worker.test_client().get('/api/working-hours', headers=headers).get_json() == []
+
+
+def test_pools_of_all_workers_stay_below_max_connections(monkeypatch):
+    monkeypatch.setenv('WEB_THREADS', '4')
+    monkeypatch.setenv('WEB_WORKERS', '17')
+    options = config.engine_options('mysql+pymysql://tima@mariadb/tima')
+    assert (options['pool_size'], options['max_overflow']) == (4, 0)
+
+    monkeypatch.setenv('WEB_WORKERS', '65')
+    options = config.engine_options('mysql+pymysql://tima@mariadb/tima')
+    assert 65 * (options['pool_size'] + options['max_overflow']) <= 100
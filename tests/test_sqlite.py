@@ -0,0 +1,67 @@
+"""
+Tests of the SQLite profile (transactions of reading & writing requests)
+"""
+
+from app import db, passwords
+from app.models import MonthlySummary
+import sqlite3
+
+from conftest import basic_auth
+
+
+def is_locked(database):
+    """
+    This method checks, if another connection holds the write lock of the database (without waiting for it)
+    """
+    other = sqlite3.connect(database, timeout=0, isolation_level=None)
+    try:
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+        return False
+    except sqlite3.OperationalError:
+        return True
+    finally:
+        other.close()
+
+
+def test_write_lock_is_free_while_password_is_checked(client, user, tmp_path, monkeypatch):
+    locked = []
+
+    def check_password_hash(password_hash, password):
+        # another writer must get the lock at once (without waiting for the busy timeout)
+        locked.append(is_locked(tmp_path / 'tima.db'))
+        return check_password(password_hash, password)
+
+    check_password = passwords.check_password_hash
+    monkeypatch.setattr(passwords, 'check_password_hash', check_password_hash)
+
+    assert client.post('/api/tokens', headers=basic_auth('tima')).status_code == 200
+    assert locked == [False]
+
+
+def test_savepoint_of_rejected_entry_begins_transaction(client, headers):
+    # the first writing statement of the request is the SAVEPOINT of WorkingHours.create
+    assert client.post('/api/working-hours', headers=headers,
+                       json={'date': '2024-03-01', 'working_hours': 8}).status_code == 201
+    assert client.post('/api/working-hours', headers=headers,
+                       json={'date': '2024-03-01', 'working_hours': 4}).status_code == 400
+
+    assert [entry['working_hours'] for entry in client.get('/api/working-hours', headers=headers).get_json()] == [8]
+
+
+def test_edited_record_is_locked_before_summary_is_changed(client, headers, tmp_path, monkeypatch):
+    created = client.post('/api/working-hours', headers=headers, json={'date': '2024-03-01', 'working_hours': 8})
+    locked = []
+
+    def record(*args, **kwargs):
+        # the difference to the current hours is only correct, if no other writer can change the record meanwhile
+        locked.append(is_locked(tmp_path / 'tima.db'))
+        return summary_record(*args, **kwargs)
+
+    summary_record = MonthlySummary.record
+    monkeypatch.setattr(MonthlySummary, 'record', staticmethod(record))
+
+    response = client.put(f'/api/working-hours/{created.get_json()["id"]}', headers=headers, json={'working_hours': 6})
+
+    assert (response.status_code, locked) == (200, [True])
+    assert db.session.query(MonthlySummary.worked_hours).scalar() == 6
@@ -0,0 +1,20 @@
+"""
+Tests of the folder of the compiled templates
+"""
+
+import os
+import pytest
+
+
+def test_template_cache_is_private(make_app, tmp_path):
+    make_app()
+
+    assert os.stat(tmp_path / 'template-cache').st_mode & 0o777 == 0o700
+
+
+def test_template_cache_writable_by_others_is_refused(make_app, tmp_path):
+    os.makedirs(tmp_path / 'shared')
+    os.chmod(tmp_path / 'shared', 0o777)
+
+    with pytest.raises(RuntimeError):
+        make_app(TEMPLATE_CACHE_FOLDER=str(tmp_path / 'shared'))
@@ -0,0 +1,28 @@
+"""
+Tests of the tokens of the WebAPI and their cache in every worker process
+"""
+
+import config
+
+from conftest import create_user, token_headers
+
+
+def test_revoked_token_is_rejected_by_other_workers_after_cache_timeout(make_app, monkeypatch):
+    worker = make_app()
+    other_worker = make_app(TOKEN_CACHE_TIMEOUT=60)
+    with worker.app_context():
+        create_user()
+    headers = token_headers(worker.test_client(), 'tima')
+    assert other_worker.test_client().get('/api/users', headers=headers).status_code == 200
+
+    assert worker.test_client().delete('/api/tokens', headers=headers).status_code == 204
+    assert worker.test_client().get('/api/users', headers=headers).status_code == 401
+
+    # the other worker still has the token in its cache until the timeout is reached
+    assert other_worker.test_client().get('/api/users', headers=headers).status_code == 200
+    monkeypatch.setattr('time.monotonic', lambda: float('inf'))
+    assert other_worker.test_client().get('/api/users', headers=headers).status_code == 401
+
+
+def test_tokens_are_cached_for_a_few_seconds():
+    assert config.Config.TOKEN_CACHE_TIMEOUT <= 5